@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+import discord
+
+from message_router import PROCESS_PATTERN
+
+
+def process_entry(message, match):
+    # Arguments for ProcessTracker.record, shared by live posts and the backfill
+    return (
+        message.id, message.guild.id, message.channel.id, message.author.id,
+        match.group(1), match.group(2), match.group(3), message.created_at.timestamp(),
+    )
+
+
+# ========================================================================
+# PAGES THROUGH A TRACKER CHANNEL'S HISTORY AND RECORDS MISSED !process POSTS
+# Each page is written in one transaction together with the id of its last
+# message, so an interrupted run resumes from there. The pause between pages
+# leaves room in the rate limit and the event loop for live handlers.
+# ========================================================================
+class ProcessBackfill:
+    def __init__(self, tracker, page_size=100, page_pause=1.0):
+        self.tracker = tracker
+        self.page_size = page_size
+        self.page_pause = page_pause
+        self.task = None
+        self.status = "No backfill has run yet."
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    def start(self, channels):
+        if self.running:
+            return False
+        self.task = asyncio.create_task(self.run(channels))
+        return True
+
+    async def run(self, channels):
+        started = time.perf_counter()
+        scanned = recorded = 0
+        for channel in channels:
+            try:
+                channel_scanned, channel_recorded = await self.backfill_channel(channel)
+            except discord.HTTPException as e:
+                print(f"Backfill of #{channel.name} stopped, will resume from its checkpoint:", e)
+                continue
+            scanned += channel_scanned
+            recorded += channel_recorded
+        elapsed = time.perf_counter() - started
+        self.status = (f"Backfill finished: {scanned} messages scanned, {recorded} new entries "
+                       f"in {len(channels)} channels ({elapsed:.1f}s).")
+        print(self.status)
+        return scanned, recorded
+
+    async def backfill_channel(self, channel):
+        checkpoint = self.tracker.checkpoint(channel.id)
+        after = discord.Object(id=checkpoint) if checkpoint else None
+        scanned = recorded = 0
+        while True:
+            # With after= set history() walks oldest to newest; without it, oldest_first starts at the top
+            page = [message async for message in channel.history(limit=self.page_size, after=after, oldest_first=True)]
+            if not page:
+                break
+            entries = []
+            for message in page:
+                if message.author.bot:
+                    continue
+                match = PROCESS_PATTERN.match(message.content)
+                if match:
+                    entries.append(process_entry(message, match))
+            recorded += self.tracker.record_many(entries, checkpoint=(channel.id, page[-1].id))
+            scanned += len(page)
+            after = page[-1]
+            self.status = f"Backfilling #{channel.name}: {scanned} messages scanned, {recorded} new entries."
+            if len(page) < self.page_size:
+                break
+            await asyncio.sleep(self.page_pause)
+        print(f"Backfilled #{channel.name}: {scanned} messages scanned, {recorded} new entries.")
+        return scanned, recorded
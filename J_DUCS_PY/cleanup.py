@@ -0,0 +1,131 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+import discord
+
+# Discord's bulk delete endpoint takes 2-100 messages per call
+BULK_DELETE_LIMIT = 100
+
+
+async def delete_messages(messages):
+    # One bulk delete per channel instead of one call per message
+    by_channel = {}
+    for message in messages:
+        by_channel.setdefault(message.channel.id, (message.channel, []))[1].append(message)
+    for channel, channel_messages in by_channel.values():
+        for start in range(0, len(channel_messages), BULK_DELETE_LIMIT):
+            chunk = channel_messages[start:start + BULK_DELETE_LIMIT]
+            try:
+                if len(chunk) == 1:
+                    await chunk[0].delete()
+                else:
+                    await channel.delete_messages(chunk)
+            except discord.NotFound:
+                pass
+            except discord.HTTPException as e:
+                # Bulk delete rejects the whole chunk if one message is gone or older than 14 days
+                print(f"Bulk delete in #{getattr(channel, 'name', channel.id)} failed, deleting one by one:", e)
+                for message in chunk:
+                    try:
+                        await message.delete()
+                    except discord.HTTPException:
+                        pass
+
+
+# ========================================================================
+# DELETES MESSAGES AFTER A DELAY FROM ONE SCHEDULER TASK
+# Replaces a sleeping coroutine per notice; messages due at the same time
+# are deleted together.
+# ========================================================================
+class ExpiringMessages:
+    def __init__(self):
+        self.heap = []
+        self.order = itertools.count()
+        self.wakeup = None
+        self.task = None
+
+    def schedule(self, messages, delay):
+        deadline = time.monotonic() + delay
+        for message in messages:
+            heapq.heappush(self.heap, (deadline, next(self.order), message))
+        if self.task is None or self.task.done():
+            # Created here so the event belongs to the running loop
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.create_task(self._run())
+        else:
+            self.wakeup.set()
+
+    async def _run(self):
+        while self.heap:
+            delay = self.heap[0][0] - time.monotonic()
+            if delay > 0:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            now = time.monotonic()
+            due = []
+            while self.heap and self.heap[0][0] <= now:
+                due.append(heapq.heappop(self.heap)[2])
+            try:
+                await delete_messages(due)
+            except Exception as e:
+                print("Failed to delete expired messages:", e)
+
+
+# ========================================================================
+# PER-CHANNEL BATCHER FOR MESSAGES THAT BREAK THE CHANNEL FORMAT
+# Violations are collected for a short window, bulk deleted, and each
+# offender gets one notice that expires on its own.
+# ========================================================================
+class CleanupBatcher:
+    def __init__(self, expiring, notice, window=2.0, notice_ttl=5.0):
+        # notice(user_id, count) returns the text posted to each offender
+        self.expiring = expiring
+        self.notice = notice
+        self.window = window
+        self.notice_ttl = notice_ttl
+        self.pending = {}
+        # The loop only keeps weak references to tasks, so pending flushes are held here
+        self.flush_tasks = set()
+        # Stats exposed through !handler-stats
+        self.flushes = 0
+        self.deleted = 0
+        self.notices = 0
+
+    def report(self, message):
+        channel_id = message.channel.id
+        if channel_id not in self.pending:
+            self.pending[channel_id] = {}
+            task = asyncio.create_task(self._flush_later(message.channel))
+            self.flush_tasks.add(task)
+            task.add_done_callback(self.flush_tasks.discard)
+        self.pending[channel_id].setdefault(message.author.id, []).append(message)
+
+    async def _flush_later(self, channel):
+        await asyncio.sleep(self.window)
+        await self.flush(channel)
+
+    async def flush(self, channel):
+        offenders = self.pending.pop(channel.id, {})
+        messages = [message for user_messages in offenders.values() for message in user_messages]
+        if not messages:
+            return
+        self.flushes += 1
+        self.deleted += len(messages)
+        await delete_messages(messages)
+        for user_id, user_messages in offenders.items():
+            try:
+                notice = await channel.send(self.notice(user_id, len(user_messages)))
+            except Exception as e:
+                print(e)
+                continue
+            self.notices += 1
+            self.expiring.schedule([notice], self.notice_ttl)
+
+    def stats(self):
+        return f"cleanup: {self.flushes} batches, {self.deleted} messages deleted, {self.notices} notices"
@@ -0,0 +1,100 @@
+import json
+import os
+
+# Used for any guild that has no entry of its own in the config file
+DEFAULT_SETTINGS = {
+    "tracker_channels": ["intern-process", "new-grad-process"],
+    "student_role": "Students/Alumni",
+    "alumni_role": None,
+    "email_domain": "@denison.edu",
+    # Extra channels per farmer feed name, e.g. {"intern": 1234567890}
+    "feed_channels": {},
+}
+
+
+def parse_setting(key, value, current):
+    # Turns the text of "!config set <key> <value>" into the stored value
+    value = value.strip()
+    if key == "tracker_channels":
+        return [name.strip().lstrip('#') for name in value.split(',') if name.strip()]
+    if key == "email_domain":
+        value = value.lower()
+        return value if value.startswith('@') else '@' + value
+    if key == "feed_channels":
+        feed, _, channel = value.partition(' ')
+        channels = dict(current or {})
+        channel = channel.strip().strip('<#>')
+        if channel.lower() in ('', 'none'):
+            channels.pop(feed, None)
+        else:
+            channels[feed] = int(channel)
+        return channels
+    return value or None
+
+
+# ========================================================================
+# PER-GUILD SETTINGS FROM guild_config.json, CACHED IN MEMORY
+# Reads are a dict lookup. Changes made with !config are written back to
+# the file and announced to the listeners so they drop their own caches.
+# ========================================================================
+class GuildSettings:
+    def __init__(self, config_file, defaults=None):
+        self.config_file = config_file
+        self.defaults = dict(DEFAULT_SETTINGS)
+        self.defaults.update(defaults or {})
+        self.file_defaults = {}
+        self.guilds = {}
+        self.listeners = []
+        self.reload()
+
+    def reload(self):
+        if not os.path.exists(self.config_file):
+            return
+        with open(self.config_file, 'r') as file:
+            config = json.load(file)
+        self.file_defaults = config.get("default", {})
+        self.defaults.update(self.file_defaults)
+        self.guilds = {int(guild_id): settings for guild_id, settings in config.get("guilds", {}).items()}
+
+    def save(self):
+        config = {
+            "default": self.file_defaults,
+            "guilds": {str(guild_id): settings for guild_id, settings in self.guilds.items()},
+        }
+        tmp_file = self.config_file + '.tmp'
+        with open(tmp_file, 'w') as file:
+            json.dump(config, file, indent=4)
+        os.replace(tmp_file, self.config_file)
+
+    def on_change(self, listener):
+        # listener(guild_id, key) runs after a guild's setting is changed
+        self.listeners.append(listener)
+
+    def get(self, guild_id, key):
+        return self.guilds.get(guild_id, {}).get(key, self.defaults.get(key))
+
+    def set(self, guild_id, key, value):
+        if key not in DEFAULT_SETTINGS:
+            raise KeyError(key)
+        self.guilds.setdefault(guild_id, {})[key] = value
+        self.save()
+        self._notify(guild_id, key)
+
+    def reset(self, guild_id, key):
+        settings = self.guilds.get(guild_id, {})
+        if key in settings:
+            del settings[key]
+            if not settings:
+                self.guilds.pop(guild_id, None)
+            self.save()
+            self._notify(guild_id, key)
+
+    def _notify(self, guild_id, key):
+        for listener in self.listeners:
+            listener(guild_id, key)
+
+    def effective(self, guild_id):
+        return {key: self.get(guild_id, key) for key in DEFAULT_SETTINGS}
+
+    def tracker_channels(self, guild_id):
+        return self.get(guild_id, "tracker_channels") or []
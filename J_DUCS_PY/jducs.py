@@ -1,200 +1,127 @@
 import os
-import re
-import asyncio
-from datetime import datetime
 
-import discord
 from discord.ext import commands
 
-intents = discord.Intents.default()
-intents.members = True
-intents.message_content = True
-intents.guilds = True
-
-bot = commands.Bot(command_prefix="!", intents=intents)
+from dotenv import load_dotenv
 
-@bot.event
-async def on_ready():
-    print(f"Logged in as {bot.user}.")
+from guild_settings import GuildSettings, DEFAULT_SETTINGS, parse_setting
+from message_router import HandlerLatency, command_name
+from cleanup import ExpiringMessages
+import metrics
 
 # ========================================================================
-# THIS FUNCTION ASKS QUESTIONS TO THE USER IN DM TO SET UP USERNAME AND ROLE
+# CORE EXTENSION, ALWAYS LOADED FIRST BY main.py
+# Owns the server settings and the single on_message dispatcher. The other
+# extensions (members, tracker) plug their handlers into the tables below.
 # ========================================================================
-@bot.event
-async def on_member_join(member):
-    try:
-        dm_channel = await member.create_dm()
-
-        async def ask_question(question):
-            await dm_channel.send(question)
-            def check(m):
-                return m.author == member and m.channel == dm_channel
-            try:
-                response = await bot.wait_for("message", check=check, timeout=6000)
-                return response.content
-            except asyncio.TimeoutError:
-                await dm_channel.send("Timed out waiting for a response. Please try rejoin the server again.")
-                raise Exception("No response received within time limit.")
-
-        # Ask for the user's name in a loop until a valid (non-empty) answer is provided
-        name = ""
-        while not name.strip():
-            name = await ask_question("Welcome to DUCS! I’m the DUCS Bot, here to help get you all set up on the server 🎉 Let’s start with a quick question — what’s your name?")
-            if not name.strip():
-                await dm_channel.send("Please enter a valid name.")
-
-        # Ask for the class year in a loop until a valid number is provided
-        current_year = datetime.now().year
-        class_year = None
-        while True:
-            class_year_str = await ask_question("What's your class year?")
-            try:
-                class_year = int(class_year_str.strip())
-                break
-            except ValueError:
-                await dm_channel.send("Please enter a valid class year as a number.")
-
-        # Ask for the Denison email
-        email = ""
-        while True:
-            email = await ask_question("What's your Denison email? (please include '@denison.edu' at the end)")
-            if email.strip().lower().endswith('@denison.edu'):
-                break
-            else:
-                await dm_channel.send("Sorry, your email does not meet the required domain. Please try again.")
-
-        # If the member is a graduate, ask if they want to update their company info
-        company = ""
-        if class_year < current_year:
-            while True:
-                company_answer = await ask_question("Since you are graduated, do you want to add your company name or school in your server nickname? If yes, please enter the company name, or type 'no' to skip.")
-                if not company_answer.strip():
-                    await dm_channel.send("Please enter a valid response.")
-                    continue
-                if company_answer.strip().lower() == 'no':
-                    break
-                company = company_answer.strip()
-                break
-
-        # Build the new nickname based on the answers
-        if class_year < current_year:
-            nickname = f"{name} - {class_year}" + (f" - {company}" if company else "")
-        else:
-            nickname = f"{name} - {class_year}"
+load_dotenv()
+# Optional extra role given to graduated classes by !reconcile; guilds can set their own with !config
+ALUMNI_ROLE_NAME = os.getenv('ALUMNI_ROLE_NAME')
+# Default file paths are relative to this directory, not to where the bot is started
+BOT_DIR = os.path.dirname(os.path.abspath(__file__))
+GUILD_CONFIG_FILE = os.getenv('GUILD_CONFIG', os.path.join(BOT_DIR, 'guild_config.json'))
+NOTICE_SECONDS = 5
+# Prometheus endpoint on 127.0.0.1:METRICS_PORT; disabled when unset
+METRICS_PORT = os.getenv('METRICS_PORT')
+
+bot = None
+guild_settings = GuildSettings(GUILD_CONFIG_FILE, defaults={"alumni_role": ALUMNI_ROLE_NAME} if ALUMNI_ROLE_NAME else None)
+handler_latency = HandlerLatency()
+expiring_messages = ExpiringMessages()
+
+# Filled in by the extensions' setup()
+# (latency label, handler) tried in order for direct messages; a handler returns True when it took the message
+DM_HANDLERS = []
+# (channel id index, latency label, handler) for channels owned by one extension
+CHANNEL_ROUTES = []
+# Commands handled before discord.py's own command parsing, keyed by prefix
+COMMAND_HANDLERS = {}
+# Extra lines for !handler-stats
+STATS_REPORTS = []
+
+metrics.Gauge('jducs_gateway_latency_seconds', 'Discord gateway heartbeat latency.', func=lambda: bot.latency)
+
+
+async def on_ready():
+    print(f"Logged in as {bot.user}.")
+    if METRICS_PORT:
+        await metrics.start_metrics_server(int(METRICS_PORT))
 
-        # Attempt to set the nickname and assign the "Students/Alumni" role
-        try:
-            await member.edit(nick=nickname)
-            role = discord.utils.get(member.guild.roles, name="Students/Alumni")
-            if role:
-                await member.add_roles(role)
-                await dm_channel.send(f"Success! Your nickname has been changed to: {nickname} and you have been assigned the 'Students/Alumni' role. Contact an admin if you want to change.")
-            else:
-                await dm_channel.send(f"Nickname updated successfully to: {nickname} but the role 'Students/Alumni' was not found.")
-        except Exception as e:
-            print("Failed to change nickname or assign role:", e)
-            await dm_channel.send("I couldn't change your nickname or assign your role. Please contact an admin.")
-    except Exception as error:
-        print("Error handling guild member join:", error)
 
 # ========================================================================
-# THIS FUNCTION LISTENS TO MESSAGES IN THE CHANNELS "intern-process" AND "new-grad-process"
-# AND REACTS TO THEM BASED ON THE CONTENT
+# MESSAGE DISPATCH: A SET LOOKUP BY CHANNEL ID, THEN A DICT LOOKUP BY COMMAND
 # ========================================================================
-@bot.event
 async def on_message(message):
     if message.author.bot:
         return
     if not message.guild:
+        # Direct messages are answers to the onboarding questions, otherwise commands such as !subscriptions
+        for label, handler in DM_HANDLERS:
+            with handler_latency.timer(label):
+                if await handler(message):
+                    return
+        await bot.process_commands(message)
         return
 
-    # Process messages in specific channels
-    if message.channel.name in ['intern-process', 'new-grad-process']:
-        pattern = r'^!process\s+(.+?)\s+(apply|phone|OA|1st round|2nd round|final|offer|rejected|ghost)(?:\s+\((.+)\))?$'
-        match = re.match(pattern, message.content, flags=re.IGNORECASE)
-        if match:
-            try:
-                await message.add_reaction('✅')
-            except Exception as e:
-                print(e)
-            if match.group(2).lower() == 'offer':
-                try:
-                    await message.channel.send("Congrats 💐!")
-                except Exception as e:
-                    print(e)
-        else:
-            try:
-                await message.delete()
-            except Exception as e:
-                print(e)
-            try:
-                notice = await message.channel.send(
-                    f"<@{message.author.id}>, please follow the format: \"!process {{company name}} {{apply|OA|phone|1st round|2nd round|final|offer|rejected|ghost}}\""
-                )
-                await asyncio.sleep(5)
-                await notice.delete()
-            except Exception as e:
-                print(e)
+    for channels, label, handler in CHANNEL_ROUTES:
+        if message.channel.id in channels:
+            with handler_latency.timer(label):
+                await handler(message)
             return
-        return
-
-    # ========================================================================
-    # THIS FUNCTION HANDLES THE "!update-title" COMMAND TO UPDATE COMPANY NAME
-    if message.content.lower().startswith('!update-title'):
-        async def reply_and_delete(content):
-            reply = await message.reply(content)
-            await asyncio.sleep(5)
-            try:
-                await reply.delete()
-                await message.delete()
-            except Exception as e:
-                print(e)
 
-        try:
-            args = message.content.split(' ')[1:]
-            new_company = ' '.join(args).strip()
-
-            member = message.author  # In guild text channels, message.author is a Member
-            current_name = member.nick if member.nick else member.name
-
-            # Expected nickname format: "Name - <year>" or "Name - <year> - <company>"
-            parts = current_name.split(" - ")
-            if len(parts) < 2:
-                await reply_and_delete("Unable to determine your name from your profile.")
-                return
-
-            try:
-                year = int(parts[1].strip())
-            except ValueError:
-                await reply_and_delete("Couldn't determine your graduation year.")
-                return
-
-            current_year = datetime.now().year
-            if year > current_year:
-                await reply_and_delete("This command is only available to graduates or those graduating this year.")
-                return
-
-            updated_nickname = f"{parts[0].strip()} - {year}" + (f" - {new_company}" if new_company else "")
-            try:
-                await member.edit(nick=updated_nickname)
-                await reply_and_delete(f"Your nickname has been updated to: {updated_nickname}")
-            except Exception as e:
-                print(e)
-                await reply_and_delete("I couldn't update your nickname. Please contact an admin.")
-                return
-        except Exception as err:
-            print("Error updating company name:", err)
-            await reply_and_delete("I couldn't update your nickname. Please contact an admin.")
+    command = command_name(message.content)
+    if command is None:
+        # Plain chat in busy channels stops here
         return
+    handler = COMMAND_HANDLERS.get(command)
+    with handler_latency.timer(command if handler else 'commands'):
+        if handler:
+            await handler(message)
+        else:
+            await bot.process_commands(message)
 
-    await bot.process_commands(message)
 
-from dotenv import load_dotenv
-load_dotenv() 
-DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
-print("Starting bot...")
-if DISCORD_TOKEN:
-    bot.run(DISCORD_TOKEN)
-else:
-    if not DISCORD_TOKEN:
-        print("Please provide your Discord token.")
\ No newline at end of file
+# ========================================================================
+# THIS COMMAND SHOWS AND CHANGES THE SERVER'S SETTINGS
+# "!config", "!config set <key> <value>", "!config reset <key>"
+# ========================================================================
+@commands.command(name="config")
+@commands.has_permissions(manage_guild=True)
+async def config(ctx, action: str = "show", key: str = "", *, value: str = ""):
+    if action == "show":
+        lines = [f"{name}: {setting}" for name, setting in guild_settings.effective(ctx.guild.id).items()]
+        await ctx.send("```\n" + "\n".join(lines) + "\n```")
+        return
+    if key not in DEFAULT_SETTINGS:
+        await ctx.send(f"Unknown setting. Choose one of: {', '.join(DEFAULT_SETTINGS)}.")
+        return
+    if action == "reset":
+        guild_settings.reset(ctx.guild.id, key)
+        await ctx.send(f"{key} reset to the default: {guild_settings.get(ctx.guild.id, key)}")
+    elif action == "set":
+        try:
+            setting = parse_setting(key, value, guild_settings.get(ctx.guild.id, key))
+        except ValueError:
+            await ctx.send("Usage: `!config set feed_channels <feed name> <#channel|none>`")
+            return
+        guild_settings.set(ctx.guild.id, key, setting)
+        await ctx.send(f"{key} set to: {setting}")
+    else:
+        await ctx.send("Usage: `!config`, `!config set <key> <value>` or `!config reset <key>`")
+
+
+@commands.command(name="handler-stats")
+@commands.has_permissions(manage_guild=True)
+async def handler_stats(ctx):
+    lines = [handler_latency.summary()] + [report() for report in STATS_REPORTS]
+    await ctx.send("```\n" + "\n".join(lines) + "\n```")
+
+
+async def setup(client):
+    global bot
+    bot = client
+    bot.add_listener(on_ready)
+    # Replaces the default on_message so commands are only parsed after the routes above
+    bot.event(on_message)
+    bot.add_command(config)
+    bot.add_command(handler_stats)
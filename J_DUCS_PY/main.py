@@ -0,0 +1,77 @@
+import json
+import os
+import sys
+import time
+
+import discord
+from discord.ext import commands
+
+from dotenv import load_dotenv
+
+# ========================================================================
+# ONE PROCESS, ONE GATEWAY CONNECTION FOR EVERY PART OF THE BOT
+# Onboarding, the process tracker and the job feeds are extensions chosen in
+# bot_config.json. A feed's heavy imports (GitPython, ijson) only happen when
+# the farmer extension is loaded.
+# ========================================================================
+load_dotenv()
+# Default file paths are relative to this directory, not to where the bot is started
+BOT_DIR = os.path.dirname(os.path.abspath(__file__))
+BOT_CONFIG_FILE = os.getenv('BOT_CONFIG', os.path.join(BOT_DIR, 'bot_config.json'))
+# The farmer's modules are imported from here when its extension is enabled
+FARMER_DIR = os.getenv('FARMER_DIR', os.path.join(BOT_DIR, '..', 'J_DUCS_farmer'))
+# Auto-sharded gateway connections for when the bot is in many guilds
+SHARDED = os.getenv('SHARDED', '0') == '1'
+
+# Always loaded first: settings and the on_message dispatcher the others plug into
+CORE_EXTENSION = 'jducs'
+DEFAULT_CONFIG = {
+    "extensions": ["members", "tracker", "jducs_farmer"],
+    # Names from the farmer's feeds.json; null runs every feed
+    "feeds": None,
+}
+
+
+def load_config(config_file):
+    config = dict(DEFAULT_CONFIG)
+    if os.path.exists(config_file):
+        with open(config_file, 'r') as file:
+            config.update(json.load(file))
+    config["extensions"] = [CORE_EXTENSION] + [name for name in config["extensions"] if name != CORE_EXTENSION]
+    return config
+
+
+def create_bot(config):
+    intents = discord.Intents.default()
+    intents.members = True
+    intents.message_content = True
+    intents.guilds = True
+
+    if SHARDED:
+        # Members are fetched when needed (onboarding, !reconcile) instead of chunking every guild at login
+        bot = commands.AutoShardedBot(command_prefix="!", intents=intents, chunk_guilds_at_startup=False)
+    else:
+        bot = commands.Bot(command_prefix="!", intents=intents)
+    bot.config = config
+
+    async def setup_hook():
+        for name in config["extensions"]:
+            start = time.perf_counter()
+            await bot.load_extension(name)
+            print(f"Loaded {name} in {time.perf_counter() - start:.2f}s.")
+
+    bot.setup_hook = setup_hook
+    return bot
+
+
+if __name__ == '__main__':
+    config = load_config(BOT_CONFIG_FILE)
+    if os.path.isdir(FARMER_DIR):
+        # Appended so modules of this directory, such as metrics.py, come first
+        sys.path.append(os.path.abspath(FARMER_DIR))
+    DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
+    print(f"Starting bot with {', '.join(config['extensions'])}...")
+    if DISCORD_TOKEN:
+        create_bot(config).run(DISCORD_TOKEN)
+    else:
+        print("Please provide your Discord token.")
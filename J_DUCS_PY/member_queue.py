@@ -0,0 +1,115 @@
+import asyncio
+import time
+
+import discord
+
+import metrics
+
+UPDATE_SECONDS = metrics.Histogram('jducs_member_update_seconds', 'Time from queueing a member edit to its completion.')
+UPDATE_RETRIES = metrics.Counter('jducs_member_update_retries_total', 'Member edits retried after 429/5xx.', ['status'])
+RATE_LIMIT_WAIT = metrics.Counter('jducs_rate_limit_wait_seconds_total', 'Seconds member edits spent backing off.')
+
+
+# ========================================================================
+# QUEUE FOR MEMBER EDITS (NICKNAME/ROLE) WITH BOUNDED CONCURRENCY AND BACKOFF
+# ========================================================================
+class MemberUpdateQueue:
+    def __init__(self, concurrency=2, max_retries=5, base_delay=1.0, max_delay=60.0):
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.queue = asyncio.Queue()
+        self.workers = []
+        # Stats exposed through !join-queue
+        self.processed = 0
+        self.failed = 0
+        self.retries = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+    @property
+    def depth(self):
+        return self.queue.qsize()
+
+    @property
+    def average_latency(self):
+        return self.total_latency / self.processed if self.processed else 0.0
+
+    def start(self):
+        if not self.workers:
+            self.workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def submit(self, job, label=''):
+        # job is an async callable; the returned future resolves with its result
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((job, label, time.perf_counter(), future))
+        return future
+
+    async def run(self, job, label=''):
+        return await (await self.submit(job, label))
+
+    def retry_delay(self, error, attempt):
+        retry_after = getattr(error, 'retry_after', None)
+        if retry_after:
+            return float(retry_after)
+        return min(self.max_delay, self.base_delay * (2 ** attempt))
+
+    async def _worker(self):
+        while True:
+            job, label, queued_at, future = await self.queue.get()
+            try:
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        result = await job()
+                        break
+                    except discord.HTTPException as e:
+                        # Only rate limits and Discord-side errors are worth retrying
+                        if attempt == self.max_retries or not (e.status == 429 or e.status >= 500):
+                            raise
+                        delay = self.retry_delay(e, attempt)
+                        self.retries += 1
+                        UPDATE_RETRIES.inc(e.status)
+                        RATE_LIMIT_WAIT.inc(amount=delay)
+                        print(f"Member update {label} got HTTP {e.status}, retrying in {delay:.1f}s...")
+                        await asyncio.sleep(delay)
+                if not future.done():
+                    future.set_result(result)
+            except Exception as e:
+                self.failed += 1
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                latency = time.perf_counter() - queued_at
+                UPDATE_SECONDS.observe(latency)
+                self.processed += 1
+                self.last_latency = latency
+                self.max_latency = max(self.max_latency, latency)
+                self.total_latency += latency
+                self.queue.task_done()
+
+    def stats(self):
+        return (f"depth={self.depth} processed={self.processed} failed={self.failed} retries={self.retries} "
+                f"latency avg={self.average_latency:.2f}s last={self.last_latency:.2f}s max={self.max_latency:.2f}s")
+
+
+# ========================================================================
+# PER-GUILD CACHE OF A ROLE LOOKED UP BY THE NAME IN THE GUILD'S SETTINGS
+# ========================================================================
+class RoleCache:
+    def __init__(self, settings, key):
+        self.settings = settings
+        self.key = key
+        self.roles = {}
+
+    def get(self, guild):
+        if guild.id not in self.roles:
+            # A missing role is cached too; creating it fires on_guild_role_create
+            role_name = self.settings.get(guild.id, self.key)
+            self.roles[guild.id] = discord.utils.get(guild.roles, name=role_name) if role_name else None
+        return self.roles[guild.id]
+
+    def invalidate(self, guild_id):
+        self.roles.pop(guild_id, None)
@@ -0,0 +1,221 @@
+import io
+import os
+from datetime import datetime
+
+import discord
+from discord.ext import commands, tasks
+
+from onboarding import OnboardingRouter, OnboardingStore
+from member_queue import MemberUpdateQueue, RoleCache
+from reconcile import MemberReconciler
+import jducs
+from jducs import guild_settings, handler_latency, expiring_messages, NOTICE_SECONDS, BOT_DIR
+import metrics
+
+# ========================================================================
+# MEMBERS EXTENSION: ONBOARDING, THE JOIN QUEUE, ROLES, !reconcile AND !update-title
+# ========================================================================
+ONBOARDING_DB = os.getenv('ONBOARDING_DB', os.path.join(BOT_DIR, 'onboarding.db'))
+RECONCILE_CHECKPOINT_FILE = os.getenv('RECONCILE_CHECKPOINT', os.path.join(BOT_DIR, 'reconcile_checkpoint.json'))
+# How many nickname/role edits may hit the API at once
+JOIN_QUEUE_CONCURRENCY = int(os.getenv('JOIN_QUEUE_CONCURRENCY', '2'))
+# How often abandoned onboarding sessions are looked for
+ONBOARDING_SWEEP_MINUTES = int(os.getenv('ONBOARDING_SWEEP_MINUTES', '60'))
+
+bot = None
+
+
+async def on_ready():
+    member_updates.start()
+    await onboarding.resume(bot)
+    # on_ready fires again after every reconnect
+    if not expire_onboarding.is_running():
+        expire_onboarding.start()
+
+# ========================================================================
+# THIS FUNCTION ASKS QUESTIONS TO THE USER IN DM TO SET UP USERNAME AND ROLE
+# Each answer arrives through on_message and is routed by author id to the
+# member's onboarding state, which is stored on disk so it survives restarts.
+# ========================================================================
+async def complete_onboarding(session):
+    guild = bot.get_guild(session.guild_id)
+    if guild is None:
+        print(f"Guild {session.guild_id} not found for onboarding of {session.user_id}.")
+        return
+    try:
+        member = guild.get_member(session.user_id) or await guild.fetch_member(session.user_id)
+    except discord.NotFound:
+        print(f"Member {session.user_id} left before finishing onboarding.")
+        return
+    dm_channel = await member.create_dm()
+    nickname = session.nickname()
+
+    role_name = guild_settings.get(guild.id, "student_role")
+
+    # Attempt to set the nickname and assign the student role ("Students/Alumni" by default)
+    async def apply_nickname_and_role():
+        await member.edit(nick=nickname)
+        role = student_roles.get(member.guild)
+        if role:
+            await member.add_roles(role)
+        return role
+
+    try:
+        role = await member_updates.run(apply_nickname_and_role, label=f"onboarding {member.id}")
+        if role:
+            await dm_channel.send(f"Success! Your nickname has been changed to: {nickname} and you have been assigned the '{role_name}' role. Contact an admin if you want to change.")
+        else:
+            await dm_channel.send(f"Nickname updated successfully to: {nickname} but the role '{role_name}' was not found.")
+    except Exception as e:
+        print("Failed to change nickname or assign role:", e)
+        await dm_channel.send("I couldn't change your nickname or assign your role. Please contact an admin.")
+
+
+member_updates = MemberUpdateQueue(concurrency=JOIN_QUEUE_CONCURRENCY)
+student_roles = RoleCache(guild_settings, "student_role")
+alumni_roles = RoleCache(guild_settings, "alumni_role")
+onboarding = OnboardingRouter(OnboardingStore(ONBOARDING_DB), complete_onboarding,
+                              email_domain=lambda guild_id: guild_settings.get(guild_id, "email_domain"))
+
+metrics.Gauge('jducs_member_update_queue_depth', 'Member edits waiting in the join queue.',
+              func=lambda: member_updates.depth)
+
+
+@tasks.loop(minutes=ONBOARDING_SWEEP_MINUTES)
+async def expire_onboarding():
+    try:
+        await onboarding.expire(bot)
+    except Exception as e:
+        print("Error expiring onboarding sessions:", e)
+
+
+async def handle_onboarding_dm(message):
+    try:
+        return await onboarding.handle_dm(message)
+    except Exception as error:
+        print("Error handling onboarding reply:", error)
+        return True
+
+
+async def on_member_join(member):
+    with handler_latency.timer('member_join'):
+        try:
+            await onboarding.start(member)
+        except Exception as error:
+            print("Error handling guild member join:", error)
+
+
+# Keep the cached student and alumni roles in sync with the guild
+def invalidate_roles(guild_id):
+    student_roles.invalidate(guild_id)
+    alumni_roles.invalidate(guild_id)
+
+async def on_guild_role_create(role):
+    invalidate_roles(role.guild.id)
+
+async def on_guild_role_update(before, after):
+    invalidate_roles(after.guild.id)
+
+async def on_guild_role_delete(role):
+    invalidate_roles(role.guild.id)
+
+
+def on_settings_change(guild_id, key):
+    if key in ("student_role", "alumni_role"):
+        invalidate_roles(guild_id)
+
+
+@commands.command(name="join-queue")
+@commands.has_permissions(manage_guild=True)
+async def join_queue(ctx):
+    await ctx.send(f"Join queue: {member_updates.stats()}")
+
+
+member_reconciler = MemberReconciler(member_updates, RECONCILE_CHECKPOINT_FILE, student_roles, alumni_roles)
+
+
+# ========================================================================
+# THIS COMMAND RECONCILES NICKNAMES AND ROLES AFTER A CLASS GRADUATES
+# "!reconcile" is a dry run listing the changes, "!reconcile apply" makes
+# them through the join queue, "!reconcile status" reports progress
+# ========================================================================
+@commands.command(name="reconcile")
+@commands.has_permissions(manage_guild=True)
+async def reconcile(ctx, action: str = "dry-run"):
+    if action == "status":
+        await ctx.send(member_reconciler.status)
+        return
+    if action == "apply":
+        if member_reconciler.start(ctx.guild):
+            await ctx.send("Reconciliation started. Use `!reconcile status` to follow it.")
+        else:
+            await ctx.send(f"A reconciliation is already running. {member_reconciler.status}")
+        return
+
+    changes, skipped = await member_reconciler.plan(ctx.guild)
+    summary = f"Dry run: {len(changes)} members would be updated."
+    if skipped:
+        summary += " Left alone: " + ", ".join(f"{count} {reason}" for reason, count in skipped.most_common()) + "."
+    report = "\n".join(change.describe() for change in changes)
+    if not changes:
+        await ctx.send(summary)
+    else:
+        await ctx.send(summary + " Run `!reconcile apply` to make these changes.",
+                       file=discord.File(io.BytesIO(report.encode()), filename="reconcile-dry-run.txt"))
+
+
+# ========================================================================
+# THIS FUNCTION HANDLES THE "!update-title" COMMAND TO UPDATE COMPANY NAME
+# ========================================================================
+async def handle_update_title(message):
+    async def reply_and_delete(content):
+        reply = await message.reply(content)
+        expiring_messages.schedule([reply, message], NOTICE_SECONDS)
+
+    try:
+        args = message.content.split(' ')[1:]
+        new_company = ' '.join(args).strip()
+
+        member = message.author  # In guild text channels, message.author is a Member
+        current_name = member.nick if member.nick else member.name
+
+        # Expected nickname format: "Name - <year>" or "Name - <year> - <company>"
+        parts = current_name.split(" - ")
+        if len(parts) < 2:
+            await reply_and_delete("Unable to determine your name from your profile.")
+            return
+
+        try:
+            year = int(parts[1].strip())
+        except ValueError:
+            await reply_and_delete("Couldn't determine your graduation year.")
+            return
+
+        current_year = datetime.now().year
+        if year > current_year:
+            await reply_and_delete("This command is only available to graduates or those graduating this year.")
+            return
+
+        updated_nickname = f"{parts[0].strip()} - {year}" + (f" - {new_company}" if new_company else "")
+        try:
+            await member.edit(nick=updated_nickname)
+            await reply_and_delete(f"Your nickname has been updated to: {updated_nickname}")
+        except Exception as e:
+            print(e)
+            await reply_and_delete("I couldn't update your nickname. Please contact an admin.")
+            return
+    except Exception as err:
+        print("Error updating company name:", err)
+        await reply_and_delete("I couldn't update your nickname. Please contact an admin.")
+
+
+async def setup(client):
+    global bot
+    bot = client
+    for listener in (on_ready, on_member_join, on_guild_role_create, on_guild_role_update, on_guild_role_delete):
+        bot.add_listener(listener)
+    bot.add_command(join_queue)
+    bot.add_command(reconcile)
+    jducs.DM_HANDLERS.append(('onboarding_dm', handle_onboarding_dm))
+    jducs.COMMAND_HANDLERS['!update-title'] = handle_update_title
+    guild_settings.on_change(on_settings_change)
@@ -0,0 +1,83 @@
+import re
+import time
+
+import metrics
+
+# Compiled once instead of on every message in the tracker channels
+PROCESS_PATTERN = re.compile(
+    r'^!process\s+(.+?)\s+(apply|phone|OA|1st round|2nd round|final|offer|rejected|ghost)(?:\s+\((.+)\))?$',
+    flags=re.IGNORECASE,
+)
+
+
+# ========================================================================
+# SET OF TRACKER CHANNEL IDS, REBUILT ONLY WHEN CHANNELS CHANGE
+# ========================================================================
+class TrackerChannelIndex:
+    def __init__(self, settings):
+        self.settings = settings
+        self.channel_ids = set()
+        self.by_guild = {}
+
+    def rebuild(self, guilds):
+        for guild in guilds:
+            self.refresh_guild(guild)
+
+    def refresh_guild(self, guild):
+        # Called on startup and whenever a channel in the guild is created, renamed or deleted
+        names = set(self.settings.tracker_channels(guild.id))
+        ids = {channel.id for channel in guild.text_channels if channel.name in names}
+        self.channel_ids.difference_update(self.by_guild.get(guild.id, set()))
+        self.channel_ids.update(ids)
+        self.by_guild[guild.id] = ids
+
+    def forget_guild(self, guild_id):
+        self.channel_ids.difference_update(self.by_guild.pop(guild_id, set()))
+
+    def __contains__(self, channel_id):
+        return channel_id in self.channel_ids
+
+
+def command_name(content):
+    # "!update-title Foo" -> "!update-title"; None when the message is not a command
+    if not content.startswith('!'):
+        return None
+    return content.split(None, 1)[0].lower()
+
+
+HANDLER_SECONDS = metrics.Histogram('jducs_handler_seconds', 'Latency of on_message and event handlers.', ['handler'])
+
+
+# ========================================================================
+# PER-HANDLER LATENCY, SHOWN BY !handler-stats
+# ========================================================================
+class HandlerLatency:
+    def __init__(self):
+        self.stats = {}
+
+    def record(self, handler, seconds):
+        HANDLER_SECONDS.observe(seconds, handler)
+        count, total, worst = self.stats.get(handler, (0, 0.0, 0.0))
+        self.stats[handler] = (count + 1, total + seconds, max(worst, seconds))
+
+    def timer(self, handler):
+        return _Timer(self, handler)
+
+    def summary(self):
+        lines = []
+        for handler, (count, total, worst) in sorted(self.stats.items()):
+            lines.append(f"{handler}: {count} calls, avg {total / count * 1000:.2f}ms, max {worst * 1000:.2f}ms")
+        return "\n".join(lines) or "No messages handled yet."
+
+
+class _Timer:
+    def __init__(self, latency, handler):
+        self.latency = latency
+        self.handler = handler
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.latency.record(self.handler, time.perf_counter() - self.start)
@@ -0,0 +1,167 @@
+import bisect
+import resource
+import time
+
+# Shared by every extension and by the farmer's benchmark.
+# Nothing is recorded until start_metrics_server() runs, so with METRICS_PORT
+# unset every update below is a single flag check.
+enabled = False
+runner = None
+REGISTRY = {}
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labels)
+        self.values = {}
+        REGISTRY[name] = self
+
+    def header(self):
+        return [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        if enabled:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        return self.header() + [f'{self.name}{_labels(self.labelnames, key)} {value}'
+                                for key, value in self.values.items()]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labels=(), func=None):
+        # func() is read at scrape time for gauges such as gateway latency
+        super().__init__(name, help_text, labels)
+        self.func = func
+
+    def set(self, value, *labels):
+        if enabled:
+            self.values[labels] = value
+
+    def render(self):
+        if self.func is not None:
+            self.values[()] = self.func()
+        return self.header() + [f'{self.name}{_labels(self.labelnames, key)} {value}'
+                                for key, value in self.values.items()]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        if not enabled:
+            return
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def time(self, *labels):
+        return _Timer(self, labels) if enabled else _NOOP_TIMER
+
+    def render(self):
+        lines = self.header()
+        for key, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, key, [("le", le)])} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {total}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {count}')
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+def render():
+    lines = []
+    for metric in REGISTRY.values():
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# ========================================================================
+# LOCAL HTTP ENDPOINT IN PROMETHEUS TEXT FORMAT: GET /metrics
+# ========================================================================
+async def start_metrics_server(port, host='127.0.0.1'):
+    global enabled, runner
+    if runner is not None:
+        return
+    # aiohttp comes with discord.py; imported here so a disabled endpoint costs nothing
+    from aiohttp import web
+
+    async def handle_metrics(request):
+        return web.Response(text=render(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    enabled = True
+    print(f"Metrics available at http://{host}:{port}/metrics")
+
+
+# Used by benchmark.py and simulate.py for per-stage memory
+def current_rss_mb():
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in KiB on Linux; only the lifetime peak is available here
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
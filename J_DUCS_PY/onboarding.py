@@ -0,0 +1,213 @@
+import sqlite3
+import time
+from datetime import datetime
+
+# ========================================================================
+# ONBOARDING STATES AND THE QUESTION ASKED IN EACH ONE
+# ========================================================================
+ASK_NAME = 'name'
+ASK_CLASS_YEAR = 'class_year'
+ASK_EMAIL = 'email'
+ASK_COMPANY = 'company'
+DONE = 'done'
+
+QUESTIONS = {
+    ASK_NAME: "Welcome to DUCS! I’m the DUCS Bot, here to help get you all set up on the server 🎉 Let’s start with a quick question — what’s your name?",
+    ASK_CLASS_YEAR: "What's your class year?",
+    ASK_EMAIL: "What's your school email? (please include '{email_domain}' at the end)",
+    ASK_COMPANY: "Since you are graduated, do you want to add your company name or school in your server nickname? If yes, please enter the company name, or type 'no' to skip.",
+}
+
+# Default only; each guild's domain comes from its settings
+EMAIL_DOMAIN = '@denison.edu'
+# Unanswered onboarding is dropped after this long (the old flow gave up after 6000s per question)
+SESSION_TIMEOUT_SECONDS = 7 * 24 * 3600
+TIMEOUT_MESSAGE = "Timed out waiting for a response. Please try rejoin the server again."
+
+
+def format_nickname(name, class_year, company=''):
+    # "Name - Year" or "Name - Year - Company"; also parsed back by !update-title and the reconciler
+    return f"{name} - {class_year}" + (f" - {company}" if company else "")
+
+
+class OnboardingSession:
+    def __init__(self, user_id, guild_id, state=ASK_NAME, name='', class_year=None, email='', company='',
+                 updated_at=None):
+        self.user_id = user_id
+        self.guild_id = guild_id
+        self.state = state
+        self.name = name
+        self.class_year = class_year
+        self.email = email
+        self.company = company
+        self.updated_at = updated_at or time.time()
+
+    def nickname(self):
+        if self.class_year < datetime.now().year:
+            return format_nickname(self.name, self.class_year, self.company)
+        return format_nickname(self.name, self.class_year)
+
+
+def question(state, email_domain=EMAIL_DOMAIN):
+    return QUESTIONS[state].format(email_domain=email_domain)
+
+
+def advance(session, answer, email_domain=EMAIL_DOMAIN):
+    # Applies one DM answer to the session and returns the replies to send.
+    # The state only moves forward on a valid answer, like the old retry loops.
+    answer = answer.strip()
+    replies = []
+    if session.state == ASK_NAME:
+        if not answer:
+            replies.append("Please enter a valid name.")
+        else:
+            session.name = answer
+            session.state = ASK_CLASS_YEAR
+    elif session.state == ASK_CLASS_YEAR:
+        try:
+            session.class_year = int(answer)
+            session.state = ASK_EMAIL
+        except ValueError:
+            replies.append("Please enter a valid class year as a number.")
+    elif session.state == ASK_EMAIL:
+        if answer.lower().endswith(email_domain):
+            session.email = answer
+            # Only graduates are asked for a company
+            session.state = ASK_COMPANY if session.class_year < datetime.now().year else DONE
+        else:
+            replies.append("Sorry, your email does not meet the required domain. Please try again.")
+    elif session.state == ASK_COMPANY:
+        if not answer:
+            replies.append("Please enter a valid response.")
+        else:
+            session.company = '' if answer.lower() == 'no' else answer
+            session.state = DONE
+
+    if session.state != DONE:
+        replies.append(question(session.state, email_domain))
+    session.updated_at = time.time()
+    return replies
+
+
+# ========================================================================
+# PERSISTENT STORE SO ONBOARDING SURVIVES A BOT RESTART
+# ========================================================================
+class OnboardingStore:
+    FIELDS = ('user_id', 'guild_id', 'state', 'name', 'class_year', 'email', 'company', 'updated_at')
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS onboarding ('
+            ' user_id INTEGER PRIMARY KEY,'
+            ' guild_id INTEGER NOT NULL,'
+            ' state TEXT NOT NULL,'
+            ' name TEXT, class_year INTEGER, email TEXT, company TEXT,'
+            ' updated_at REAL NOT NULL'
+            ')'
+        )
+        self.conn.commit()
+
+    def load_all(self):
+        rows = self.conn.execute(f"SELECT {', '.join(self.FIELDS)} FROM onboarding").fetchall()
+        return [OnboardingSession(**dict(zip(self.FIELDS, row))) for row in rows]
+
+    def save(self, session):
+        with self.conn:
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO onboarding ({', '.join(self.FIELDS)}) VALUES ({', '.join('?' * len(self.FIELDS))})",
+                tuple(getattr(session, field) for field in self.FIELDS),
+            )
+
+    def delete(self, user_id):
+        with self.conn:
+            self.conn.execute('DELETE FROM onboarding WHERE user_id = ?', (user_id,))
+
+
+# ========================================================================
+# DM ROUTER: ONE DICT LOOKUP PER DIRECT MESSAGE
+# ========================================================================
+class OnboardingRouter:
+    def __init__(self, store, on_complete, email_domain=lambda guild_id: EMAIL_DOMAIN):
+        # on_complete(session) applies the nickname/role once all answers are in;
+        # email_domain(guild_id) gives the domain each guild accepts
+        self.store = store
+        self.on_complete = on_complete
+        self.email_domain = email_domain
+        self.sessions = {}
+
+    def question(self, session):
+        return question(session.state, self.email_domain(session.guild_id))
+
+    async def start(self, member):
+        session = OnboardingSession(member.id, member.guild.id)
+        self.sessions[member.id] = session
+        self.store.save(session)
+        await member.send(self.question(session))
+
+    async def handle_dm(self, message):
+        # Returns False when the author has no onboarding in progress
+        session = self.sessions.get(message.author.id)
+        if session is None:
+            return False
+        replies = advance(session, message.content, self.email_domain(session.guild_id))
+        for reply in replies:
+            await message.channel.send(reply)
+        # Saved before applying so a crash mid-apply is retried by resume()
+        self.store.save(session)
+        if session.state == DONE:
+            await self.finish(session)
+        return True
+
+    async def finish(self, session):
+        self.sessions.pop(session.user_id, None)
+        try:
+            await self.on_complete(session)
+        finally:
+            self.store.delete(session.user_id)
+
+    async def resume(self, client):
+        # Reload unfinished onboarding after a restart and re-ask the pending question
+        now = time.time()
+        resumed = 0
+        for session in self.store.load_all():
+            if session.user_id in self.sessions:
+                continue
+            if session.state == DONE:
+                try:
+                    await self.finish(session)
+                except Exception as e:
+                    print(f"Failed to finish onboarding for {session.user_id}:", e)
+                continue
+            expired = now - session.updated_at > SESSION_TIMEOUT_SECONDS
+            if expired:
+                self.store.delete(session.user_id)
+            else:
+                self.sessions[session.user_id] = session
+                resumed += 1
+            try:
+                user = client.get_user(session.user_id) or await client.fetch_user(session.user_id)
+                if expired:
+                    await user.send(TIMEOUT_MESSAGE)
+                else:
+                    await user.send(f"Sorry, I was restarted. Let's pick up where we left off.\n{self.question(session)}")
+            except Exception as e:
+                print(f"Failed to DM {session.user_id} about their onboarding:", e)
+        print(f"Resumed {resumed} onboarding sessions.")
+
+    async def expire(self, client, now=None):
+        # Drops the sessions with no answer for SESSION_TIMEOUT_SECONDS and tells the member
+        now = now or time.time()
+        expired = [session for session in self.sessions.values() if now - session.updated_at > SESSION_TIMEOUT_SECONDS]
+        for session in expired:
+            self.sessions.pop(session.user_id, None)
+            self.store.delete(session.user_id)
+            try:
+                user = client.get_user(session.user_id) or await client.fetch_user(session.user_id)
+                await user.send(TIMEOUT_MESSAGE)
+            except Exception as e:
+                print(f"Failed to DM {session.user_id} about their expired onboarding:", e)
+        if expired:
+            print(f"Expired {len(expired)} onboarding sessions.")
+        return len(expired)
@@ -0,0 +1,198 @@
+import sqlite3
+
+# Canonical spelling of each stage accepted by the !process grammar
+STAGES = ['apply', 'OA', 'phone', '1st round', '2nd round', 'final', 'offer', 'rejected', 'ghost']
+STAGE_BY_KEY = {stage.lower(): stage for stage in STAGES}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    message_id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    company TEXT NOT NULL,
+    company_key TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    note TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_company ON entries (guild_id, company_key, created_at);
+CREATE INDEX IF NOT EXISTS idx_entries_stage ON entries (guild_id, stage, created_at);
+CREATE INDEX IF NOT EXISTS idx_entries_user ON entries (guild_id, user_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_entries_created ON entries (created_at);
+
+CREATE TABLE IF NOT EXISTS companies (
+    guild_id INTEGER NOT NULL,
+    company_key TEXT NOT NULL,
+    display TEXT NOT NULL,
+    participants INTEGER NOT NULL DEFAULT 0,
+    offers INTEGER NOT NULL DEFAULT 0,
+    durations INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (guild_id, company_key)
+);
+
+CREATE TABLE IF NOT EXISTS stage_counts (
+    guild_id INTEGER NOT NULL,
+    company_key TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, company_key, stage)
+);
+
+CREATE TABLE IF NOT EXISTS user_company (
+    guild_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    company_key TEXT NOT NULL,
+    applied_at REAL,
+    offer_at REAL,
+    PRIMARY KEY (guild_id, user_id, company_key)
+);
+
+CREATE TABLE IF NOT EXISTS offer_durations (
+    guild_id INTEGER NOT NULL,
+    company_key TEXT NOT NULL,
+    days REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_offer_durations ON offer_durations (guild_id, company_key, days);
+
+CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+    channel_id INTEGER PRIMARY KEY,
+    last_message_id INTEGER NOT NULL
+);
+'''
+
+
+def company_key(company):
+    return ' '.join(company.split()).lower()
+
+
+# ========================================================================
+# STORE OF ACCEPTED !process POSTS WITH INCREMENTALLY MAINTAINED AGGREGATES
+# ========================================================================
+class ProcessTracker:
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def record(self, message_id, guild_id, channel_id, user_id, company, stage, note, created_at):
+        # Returns False when the message was already recorded (live post seen again by a backfill)
+        with self.conn:
+            return self._record(message_id, guild_id, channel_id, user_id, company, stage, note, created_at)
+
+    def record_many(self, entries, checkpoint=None):
+        # Bulk insert in one transaction; checkpoint=(channel_id, message_id) is saved with it
+        with self.conn:
+            recorded = sum(self._record(*entry) for entry in entries)
+            if checkpoint:
+                self.conn.execute(
+                    'INSERT INTO backfill_checkpoints VALUES (?, ?) '
+                    'ON CONFLICT (channel_id) DO UPDATE SET last_message_id = excluded.last_message_id',
+                    checkpoint,
+                )
+        return recorded
+
+    def checkpoint(self, channel_id):
+        row = self.conn.execute(
+            'SELECT last_message_id FROM backfill_checkpoints WHERE channel_id = ?', (channel_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _record(self, message_id, guild_id, channel_id, user_id, company, stage, note, created_at):
+        company = ' '.join(company.split())
+        key = company_key(company)
+        stage = STAGE_BY_KEY.get(stage.lower(), stage)
+        inserted = self.conn.execute(
+            'INSERT OR IGNORE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (message_id, guild_id, channel_id, user_id, company, key, stage, note, created_at),
+        ).rowcount
+        if not inserted:
+            return False
+
+        self.conn.execute(
+            'INSERT INTO companies (guild_id, company_key, display) VALUES (?, ?, ?) '
+            'ON CONFLICT (guild_id, company_key) DO NOTHING',
+            (guild_id, key, company),
+        )
+        self.conn.execute(
+            'INSERT INTO stage_counts VALUES (?, ?, ?, 1) '
+            'ON CONFLICT (guild_id, company_key, stage) DO UPDATE SET count = count + 1',
+            (guild_id, key, stage),
+        )
+
+        row = self.conn.execute(
+            'SELECT applied_at, offer_at FROM user_company WHERE guild_id = ? AND user_id = ? AND company_key = ?',
+            (guild_id, user_id, key),
+        ).fetchone()
+        if row is None:
+            applied_at, offer_at = None, None
+            self.conn.execute('INSERT INTO user_company (guild_id, user_id, company_key) VALUES (?, ?, ?)',
+                              (guild_id, user_id, key))
+            self.conn.execute('UPDATE companies SET participants = participants + 1 '
+                              'WHERE guild_id = ? AND company_key = ?', (guild_id, key))
+        else:
+            applied_at, offer_at = row
+
+        had_both = applied_at is not None and offer_at is not None
+        if stage == 'apply' and applied_at is None:
+            applied_at = created_at
+            self.conn.execute('UPDATE user_company SET applied_at = ? WHERE guild_id = ? AND user_id = ? AND company_key = ?',
+                              (applied_at, guild_id, user_id, key))
+        elif stage == 'offer' and offer_at is None:
+            offer_at = created_at
+            self.conn.execute('UPDATE user_company SET offer_at = ? WHERE guild_id = ? AND user_id = ? AND company_key = ?',
+                              (offer_at, guild_id, user_id, key))
+            self.conn.execute('UPDATE companies SET offers = offers + 1 WHERE guild_id = ? AND company_key = ?',
+                              (guild_id, key))
+        if not had_both and applied_at is not None and offer_at is not None and offer_at >= applied_at:
+            self.conn.execute('INSERT INTO offer_durations VALUES (?, ?, ?)',
+                              (guild_id, key, (offer_at - applied_at) / 86400))
+            self.conn.execute('UPDATE companies SET durations = durations + 1 WHERE guild_id = ? AND company_key = ?',
+                              (guild_id, key))
+        return True
+
+    def median_days_to_offer(self, guild_id, key, count):
+        if not count:
+            return None
+        # The index on (guild_id, company_key, days) makes this a short range scan
+        rows = self.conn.execute(
+            'SELECT days FROM offer_durations WHERE guild_id = ? AND company_key = ? ORDER BY days LIMIT ? OFFSET ?',
+            (guild_id, key, 2 - count % 2, (count - 1) // 2),
+        ).fetchall()
+        return sum(row[0] for row in rows) / len(rows)
+
+    def company_stats(self, guild_id, company, recent_limit=5):
+        key = company_key(company)
+        row = self.conn.execute(
+            'SELECT display, participants, offers, durations FROM companies WHERE guild_id = ? AND company_key = ?',
+            (guild_id, key),
+        ).fetchone()
+        if row is None:
+            return None
+        display, participants, offers, durations = row
+        counts = dict(self.conn.execute(
+            'SELECT stage, count FROM stage_counts WHERE guild_id = ? AND company_key = ?', (guild_id, key)
+        ).fetchall())
+        recent = self.conn.execute(
+            'SELECT user_id, stage, created_at FROM entries WHERE guild_id = ? AND company_key = ? '
+            'ORDER BY created_at DESC LIMIT ?',
+            (guild_id, key, recent_limit),
+        ).fetchall()
+        return {
+            'company': display,
+            'stage_counts': {stage: counts[stage] for stage in STAGES if stage in counts},
+            'participants': participants,
+            'offers': offers,
+            'offer_rate': offers / participants if participants else 0.0,
+            'median_days_to_offer': self.median_days_to_offer(guild_id, key, durations),
+            'recent': recent,
+        }
+
+    def user_stats(self, guild_id, user_id):
+        # Latest stage per company for one member, newest first
+        return self.conn.execute(
+            'SELECT company, stage, MAX(created_at) AS last_at FROM entries WHERE guild_id = ? AND user_id = ? '
+            'GROUP BY company_key ORDER BY last_at DESC',
+            (guild_id, user_id),
+        ).fetchall()
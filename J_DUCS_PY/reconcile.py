@@ -0,0 +1,154 @@
+import asyncio
+import json
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime
+
+from onboarding import format_nickname
+
+# Classes count as graduated from this month of their class year on
+GRADUATION_MONTH = 5
+# Progress is written to the checkpoint file after every this many edits
+CHECKPOINT_EVERY = 25
+
+NICKNAME_SEPARATOR = re.compile(r'\s+-\s+')
+CLASS_YEAR = re.compile(r'\d{4}')
+
+
+def parse_nickname(nickname):
+    # (name, class_year, company) from "Name - Year" or "Name - Year - Company", None otherwise
+    parts = NICKNAME_SEPARATOR.split(nickname.strip(), maxsplit=2)
+    if len(parts) < 2 or not CLASS_YEAR.fullmatch(parts[1]):
+        return None
+    company = ' '.join(parts[2].split()) if len(parts) == 3 else ''
+    return ' '.join(parts[0].split()), int(parts[1]), company
+
+
+def has_graduated(class_year, today):
+    return class_year < today.year or (class_year == today.year and today.month >= GRADUATION_MONTH)
+
+
+class MemberChange:
+    def __init__(self, member, nick=None, add_roles=()):
+        self.member = member
+        self.nick = nick
+        self.add_roles = list(add_roles)
+
+    def describe(self):
+        changes = []
+        if self.nick is not None:
+            changes.append(f"nick '{self.member.nick or self.member.name}' -> '{self.nick}'")
+        if self.add_roles:
+            changes.append("add " + ", ".join(role.name for role in self.add_roles))
+        return f"{self.member} ({self.member.id}): " + "; ".join(changes)
+
+    async def apply(self):
+        # Nickname and roles go out in a single PATCH instead of edit() followed by add_roles()
+        changes = {}
+        if self.nick is not None:
+            changes['nick'] = self.nick
+        if self.add_roles:
+            changes['roles'] = [role for role in self.member.roles if not role.is_default()] + self.add_roles
+        await self.member.edit(**changes, reason="Class year reconciliation")
+
+
+# ========================================================================
+# CLASS-YEAR ROLLOVER: NORMALIZES NICKNAMES AND ASSIGNS STUDENT/ALUMNI ROLES
+# The member list is loaded once, every nickname is parsed, and the edits
+# go through the member update queue. Progress is checkpointed by member id
+# so an interrupted run picks up where it stopped.
+# ========================================================================
+class MemberReconciler:
+    def __init__(self, updates, checkpoint_file, student_roles, alumni_roles=None):
+        self.updates = updates
+        self.checkpoint_file = checkpoint_file
+        self.student_roles = student_roles
+        self.alumni_roles = alumni_roles
+        self.checkpoints = {}
+        self.task = None
+        self.status = "No reconciliation has run yet."
+        if os.path.exists(checkpoint_file):
+            with open(checkpoint_file, 'r') as file:
+                self.checkpoints = json.load(file)
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    def save_checkpoints(self):
+        tmp_file = self.checkpoint_file + '.tmp'
+        with open(tmp_file, 'w') as file:
+            json.dump(self.checkpoints, file)
+        os.replace(tmp_file, self.checkpoint_file)
+
+    def plan_member(self, member, student_role, alumni_role, today):
+        # Returns (change, None) or (None, reason the member is left alone)
+        if member.bot:
+            return None, 'bots'
+        parsed = parse_nickname(member.nick or member.name)
+        if parsed is None:
+            return None, 'unparsed nicknames'
+        name, class_year, company = parsed
+        nick = format_nickname(name, class_year, company)
+        add_roles = []
+        if student_role and student_role not in member.roles:
+            add_roles.append(student_role)
+        if alumni_role and has_graduated(class_year, today) and alumni_role not in member.roles:
+            add_roles.append(alumni_role)
+        change = MemberChange(member, nick if nick != (member.nick or member.name) else None, add_roles)
+        if change.nick is None and not change.add_roles:
+            return None, 'up to date'
+        if member.id == member.guild.owner_id or member.top_role >= member.guild.me.top_role:
+            return None, 'above the bot'
+        return change, None
+
+    async def plan(self, guild, today=None):
+        today = today or datetime.now()
+        if not guild.chunked:
+            # One gateway member request instead of a REST call per page of members
+            await guild.chunk()
+        student_role = self.student_roles.get(guild)
+        alumni_role = self.alumni_roles.get(guild) if self.alumni_roles else None
+        changes = []
+        skipped = Counter()
+        for member in sorted(guild.members, key=lambda member: member.id):
+            change, reason = self.plan_member(member, student_role, alumni_role, today)
+            if change:
+                changes.append(change)
+            else:
+                skipped[reason] += 1
+        return changes, skipped
+
+    def start(self, guild):
+        if self.running:
+            return False
+        self.task = asyncio.create_task(self.apply(guild))
+        return True
+
+    async def apply(self, guild):
+        started = time.perf_counter()
+        changes, _ = await self.plan(guild)
+        key = str(guild.id)
+        resume_after = self.checkpoints.get(key, {}).get('last_member_id', 0)
+        changes = [change for change in changes if change.member.id > resume_after]
+        applied = failed = 0
+        for start in range(0, len(changes), CHECKPOINT_EVERY):
+            window = changes[start:start + CHECKPOINT_EVERY]
+            futures = [await self.updates.submit(change.apply, label=f"reconcile {change.member.id}") for change in window]
+            for change, result in zip(window, await asyncio.gather(*futures, return_exceptions=True)):
+                if isinstance(result, Exception):
+                    failed += 1
+                    print(f"Reconcile failed for {change.member.id}:", result)
+                else:
+                    applied += 1
+            self.checkpoints[key] = {'last_member_id': window[-1].member.id, 'updated_at': time.time()}
+            self.save_checkpoints()
+            self.status = f"Reconciling {guild.name}: {start + len(window)}/{len(changes)} members, {failed} failed."
+        self.checkpoints.pop(key, None)
+        self.save_checkpoints()
+        self.status = (f"Reconciliation of {guild.name} finished: {applied} members updated, {failed} failed "
+                       f"({time.perf_counter() - started:.1f}s).")
+        print(self.status)
+        return applied, failed
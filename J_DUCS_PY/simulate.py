@@ -0,0 +1,418 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# ===============================================================
+# Offline load simulation for the members and tracker extensions
+#
+#   python simulate.py                                   # 500 joins in 60s plus channel traffic
+#   python simulate.py --joins 2000 --join-window 120 --process-rate 30
+#
+# Drives on_member_join, the onboarding DMs and the !process channels through
+# a fake client, guild and channels, so no Discord token or server is needed.
+# Every fake API call waits --api-latency seconds.
+# ===============================================================
+WORKDIR = tempfile.mkdtemp(prefix='jducs-sim-')
+# Set before the extensions are imported; load_dotenv() does not override them
+os.environ.update({
+    'ONBOARDING_DB': os.path.join(WORKDIR, 'onboarding.db'),
+    'PROCESS_TRACKER_DB': os.path.join(WORKDIR, 'process_tracker.db'),
+    'GUILD_CONFIG': os.path.join(WORKDIR, 'guild_config.json'),
+    'RECONCILE_CHECKPOINT': os.path.join(WORKDIR, 'reconcile_checkpoint.json'),
+    'BACKFILL_ON_START': '0',
+    'METRICS_PORT': '',
+})
+
+import jducs
+import members
+import tracker
+from onboarding import EMAIL_DOMAIN
+from metrics import current_rss_mb
+
+GUILD_ID = 1000
+STUDENT_ROLE = 'Students/Alumni'
+TRACKER_CHANNELS = ['intern-process', 'new-grad-process']
+COMPANIES = ['Google', 'Meta', 'Jane Street', 'Epic Systems', 'Capital One', 'Goldman Sachs', 'Microsoft']
+STAGES = ['apply', 'OA', 'phone', '1st round', '2nd round', 'final', 'offer', 'rejected', 'ghost']
+MALFORMED = ['!process Google', '!proces Meta offer', 'got the offer!!', '!process Meta maybe', 'anyone heard back?']
+CHAT = ['hello', 'good luck everyone', 'anyone doing leetcode tonight?', 'lol', 'thanks!']
+
+
+# ===============================================================
+# Fakes
+# ===============================================================
+class FakeApi:
+    # Every REST call goes through here: a fixed latency and a count per endpoint
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = {}
+
+    async def call(self, endpoint):
+        self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+
+class FakeRole:
+    def __init__(self, role_id, name):
+        self.id = role_id
+        self.name = name
+
+
+class FakeMessage:
+    def __init__(self, message_id, content, author, channel):
+        self.id = message_id
+        self.content = content
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+        self.created_at = datetime.now(timezone.utc)
+
+    async def add_reaction(self, emoji):
+        await self.channel.api.call('add_reaction')
+
+    async def reply(self, content):
+        return await self.channel.send(content)
+
+    async def delete(self):
+        await self.channel.api.call('delete_message')
+
+
+class FakeChannel:
+    def __init__(self, channel_id, name, guild, api):
+        self.id = channel_id
+        self.name = name
+        self.guild = guild
+        self.api = api
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        await self.api.call('send')
+        message = FakeMessage(next_id(), content, self.guild.me if self.guild else None, self)
+        self.sent.append(message)
+        return message
+
+    async def delete_messages(self, messages):
+        await self.api.call('bulk_delete')
+
+
+class FakeMember:
+    def __init__(self, member_id, name, guild, api, bot=False):
+        self.id = member_id
+        self.name = name
+        self.nick = None
+        self.bot = bot
+        self.guild = guild
+        self.roles = []
+        self.api = api
+        self.dm_channel = FakeChannel(next_id(), f'dm-{member_id}', None, api)
+        self.joined_at = time.perf_counter()
+        self.onboarded_at = None
+
+    def __str__(self):
+        return self.name
+
+    async def send(self, content):
+        return await self.dm_channel.send(content)
+
+    async def create_dm(self):
+        return self.dm_channel
+
+    async def edit(self, nick=None, roles=None):
+        await self.api.call('edit_member')
+        self.nick = nick
+        if roles is not None:
+            self.roles = list(roles)
+        self.onboarded_at = time.perf_counter()
+
+    async def add_roles(self, *roles):
+        await self.api.call('add_role')
+        self.roles.extend(roles)
+
+
+class FakeGuild:
+    def __init__(self, api):
+        self.id = GUILD_ID
+        self.name = 'DUCS'
+        self.api = api
+        self.roles = [FakeRole(next_id(), STUDENT_ROLE)]
+        self.members = {}
+        self.me = FakeMember(next_id(), 'DUCS Bot', self, api, bot=True)
+        self.text_channels = [FakeChannel(next_id(), name, self, api) for name in TRACKER_CHANNELS + ['general']]
+
+    def get_member(self, member_id):
+        return self.members.get(member_id)
+
+    async def fetch_member(self, member_id):
+        await self.api.call('fetch_member')
+        return self.members[member_id]
+
+    def get_channel(self, channel_id):
+        return next((channel for channel in self.text_channels if channel.id == channel_id), None)
+
+    def channel(self, name):
+        return next(channel for channel in self.text_channels if channel.name == name)
+
+
+class FakeClient:
+    # Just what the extensions' setup() and handlers use from commands.Bot
+    def __init__(self, guild):
+        self.guild = guild
+        self.guilds = [guild]
+        self.user = guild.me
+        self.latency = 0.05
+        self.listeners = {}
+        self.commands = []
+        self.processed_commands = 0
+
+    def add_listener(self, func, name=None):
+        self.listeners.setdefault(name or func.__name__, []).append(func)
+
+    def add_command(self, command):
+        self.commands.append(command)
+
+    def event(self, coro):
+        setattr(self, coro.__name__, coro)
+        return coro
+
+    def get_guild(self, guild_id):
+        return self.guild if guild_id == self.guild.id else None
+
+    def get_user(self, user_id):
+        return self.guild.get_member(user_id)
+
+    async def fetch_user(self, user_id):
+        return self.guild.members[user_id]
+
+    async def process_commands(self, message):
+        self.processed_commands += 1
+
+    async def dispatch(self, event, *args):
+        for listener in self.listeners.get(event, []):
+            await listener(*args)
+
+
+_last_id = 0
+
+
+def next_id():
+    global _last_id
+    _last_id += 1
+    return _last_id
+
+
+# ===============================================================
+# Measurement
+# ===============================================================
+def percentiles(values):
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def rank(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+    return {
+        'count': len(ordered),
+        'p50_ms': round(rank(50) * 1000, 2),
+        'p95_ms': round(rank(95) * 1000, 2),
+        'p99_ms': round(rank(99) * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2),
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+
+    async def timed(self, name, coro):
+        start = time.perf_counter()
+        try:
+            await coro
+        except Exception as e:
+            print(f"{name} raised: {e!r}")
+            name += '_error'
+        self.latencies.setdefault(name, []).append(time.perf_counter() - start)
+
+
+class Sampler:
+    # Pending tasks, join queue depth, event loop lag and RSS, every interval seconds
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak_tasks = 0
+        self.peak_queue_depth = 0
+        self.peak_rss_mb = current_rss_mb()
+        self.loop_lag = []
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.loop_lag.append(time.perf_counter() - start - self.interval)
+            self.peak_tasks = max(self.peak_tasks, len(asyncio.all_tasks()))
+            self.peak_queue_depth = max(self.peak_queue_depth, members.member_updates.depth)
+            self.peak_rss_mb = max(self.peak_rss_mb, current_rss_mb())
+
+    def stop(self):
+        self.task.cancel()
+
+
+# ===============================================================
+# Traffic
+# ===============================================================
+def onboarding_answers(index, args):
+    year = datetime.now().year + random.choice([-2, -1, 0, 1, 2, 3])
+    email = f"student{index}{EMAIL_DOMAIN}"
+    answers = [f"Student {index}", str(year)]
+    if random.random() < args.bad_answer_rate:
+        answers.append(f"student{index}@gmail.com")
+    answers.append(email)
+    if year < datetime.now().year:
+        answers.append(random.choice(COMPANIES + ['no']))
+    return answers
+
+
+async def member_lifecycle(index, client, guild, api, recorder, args):
+    # Joins at a random point of the window, then answers each question after some thought
+    await asyncio.sleep(random.uniform(0, args.join_window))
+    member = FakeMember(next_id(), f"student{index}", guild, api)
+    guild.members[member.id] = member
+    await recorder.timed('member_join', client.dispatch('on_member_join', member))
+    for answer in onboarding_answers(index, args):
+        await asyncio.sleep(random.expovariate(1 / args.think_time))
+        message = FakeMessage(next_id(), answer, member, member.dm_channel)
+        await recorder.timed('onboarding_dm', jducs.on_message(message))
+    return member
+
+
+async def channel_traffic(client, guild, api, recorder, args, chatters):
+    # Poisson arrivals of !process posts (some malformed) and plain chat for the whole join window
+    tasks = []
+    end = time.perf_counter() + args.join_window
+    rate = args.process_rate + args.chat_rate
+    if rate <= 0:
+        return
+    while time.perf_counter() < end:
+        await asyncio.sleep(random.expovariate(rate))
+        author = random.choice(chatters)
+        if random.random() < args.process_rate / rate:
+            channel = guild.channel(random.choice(TRACKER_CHANNELS))
+            if random.random() < args.malformed_rate:
+                content, name = random.choice(MALFORMED), 'process_malformed'
+            else:
+                content, name = f"!process {random.choice(COMPANIES)} {random.choice(STAGES)}", 'process'
+        else:
+            channel = guild.channel('general')
+            content, name = random.choice(CHAT), 'chat'
+        message = FakeMessage(next_id(), content, author, channel)
+        # Handlers run concurrently, as discord.py dispatches each event in its own task
+        tasks.append(asyncio.create_task(recorder.timed(name, jducs.on_message(message))))
+    await asyncio.gather(*tasks)
+
+
+async def simulate(args):
+    api = FakeApi(args.api_latency)
+    guild = FakeGuild(api)
+    client = FakeClient(guild)
+    chatters = [FakeMember(next_id(), f"regular{i}", guild, api) for i in range(200)]
+    for member in chatters:
+        guild.members[member.id] = member
+    for extension in (jducs, members, tracker):
+        await extension.setup(client)
+    await client.dispatch('on_ready')
+
+    recorder = Recorder()
+    sampler = Sampler()
+    sampler.start()
+    start = time.perf_counter()
+    joined = await asyncio.gather(
+        *(member_lifecycle(i, client, guild, api, recorder, args) for i in range(args.joins)),
+        channel_traffic(client, guild, api, recorder, args, chatters),
+    )
+    # Let the join queue drain and the cleanup batches and notices expire
+    while members.member_updates.depth:
+        await asyncio.sleep(0.1)
+    await asyncio.sleep(tracker.CLEANUP_WINDOW + jducs.NOTICE_SECONDS + 1)
+    elapsed = time.perf_counter() - start
+    sampler.stop()
+
+    new_members = joined[:args.joins]
+    onboarded = [member for member in new_members if member.onboarded_at]
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'settings': vars(args),
+        'seconds': round(elapsed, 2),
+        'handlers': {name: percentiles(values) for name, values in sorted(recorder.latencies.items())},
+        'join_to_nickname': percentiles([member.onboarded_at - member.joined_at for member in onboarded]),
+        'onboarded': len(onboarded),
+        'with_student_role': sum(1 for member in onboarded if member.roles),
+        'process_entries': tracker.process_tracker.conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0],
+        'commands_passed_on': client.processed_commands,
+        'api_calls': api.calls,
+        'peak_pending_tasks': sampler.peak_tasks,
+        'peak_join_queue_depth': sampler.peak_queue_depth,
+        'loop_lag': percentiles(sampler.loop_lag),
+        'peak_rss_mb': round(sampler.peak_rss_mb, 1),
+        'cleanup': tracker.process_cleanup.stats(),
+    }
+    return report
+
+
+def print_report(report):
+    print(f"\n{report['settings']['joins']} joins over {report['settings']['join_window']}s, "
+          f"finished in {report['seconds']}s")
+    print(f"  {'handler':<20} {'count':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}  (ms)")
+    rows = list(report['handlers'].items()) + [('join_to_nickname', report['join_to_nickname']),
+                                               ('loop_lag', report['loop_lag'])]
+    for name, stats in rows:
+        if stats:
+            print(f"  {name:<20} {stats['count']:>7} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} "
+                  f"{stats['p99_ms']:>9.2f} {stats['max_ms']:>9.2f}")
+    print(f"  onboarded {report['onboarded']}, with role {report['with_student_role']}, "
+          f"process entries {report['process_entries']}")
+    print(f"  peak pending tasks {report['peak_pending_tasks']}, peak join queue {report['peak_join_queue_depth']}, "
+          f"peak RSS {report['peak_rss_mb']} MB")
+    print(f"  API calls: {', '.join(f'{name} {count}' for name, count in sorted(report['api_calls'].items()))}")
+    print(f"  {report['cleanup']}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Offline load simulation for onboarding and message handling.")
+    parser.add_argument('--joins', type=int, default=500, help="members joining during the window")
+    parser.add_argument('--join-window', type=float, default=60.0, help="seconds over which members join")
+    parser.add_argument('--think-time', type=float, default=3.0, help="mean seconds before each onboarding answer")
+    parser.add_argument('--bad-answer-rate', type=float, default=0.1, help="share of members giving a wrong email first")
+    parser.add_argument('--process-rate', type=float, default=10.0, help="!process posts per second")
+    parser.add_argument('--malformed-rate', type=float, default=0.2, help="share of malformed tracker posts")
+    parser.add_argument('--chat-rate', type=float, default=20.0, help="plain chat messages per second")
+    parser.add_argument('--api-latency', type=float, default=0.05, help="fake seconds per REST call")
+    parser.add_argument('--output', default='sim_results', help="directory the results JSON is written to")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    try:
+        report = await simulate(args)
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
+    print_report(report)
+
+    os.makedirs(args.output, exist_ok=True)
+    output_file = os.path.join(args.output, f"sim-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output_file, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"\nResults saved to {output_file}")
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,172 @@
+import os
+from datetime import datetime
+
+import discord
+from discord.ext import commands
+
+from message_router import PROCESS_PATTERN, TrackerChannelIndex
+from process_tracker import ProcessTracker
+from backfill import ProcessBackfill, process_entry
+from cleanup import CleanupBatcher
+import jducs
+from jducs import guild_settings, expiring_messages, NOTICE_SECONDS, BOT_DIR
+
+# ========================================================================
+# TRACKER EXTENSION: THE "!process" CHANNELS, !stats AND !backfill
+# ========================================================================
+PROCESS_TRACKER_DB = os.getenv('PROCESS_TRACKER_DB', os.path.join(BOT_DIR, 'process_tracker.db'))
+# Catch up on tracker channel history missed while the bot was offline
+BACKFILL_ON_START = os.getenv('BACKFILL_ON_START', '1') == '1'
+BACKFILL_PAGE_PAUSE = float(os.getenv('BACKFILL_PAGE_PAUSE', '1.0'))
+# Badly formatted posts are collected for this long, then deleted together
+CLEANUP_WINDOW = float(os.getenv('CLEANUP_WINDOW', '2.0'))
+
+bot = None
+tracker_channels = TrackerChannelIndex(guild_settings)
+process_tracker = ProcessTracker(PROCESS_TRACKER_DB)
+process_backfill = ProcessBackfill(process_tracker, page_pause=BACKFILL_PAGE_PAUSE)
+
+
+def process_format_notice(user_id, count):
+    removed = f"{count} of your messages were removed. " if count > 1 else ""
+    return (f"<@{user_id}>, {removed}please follow the format: "
+            f"\"!process {{company name}} {{apply|OA|phone|1st round|2nd round|final|offer|rejected|ghost}}\"")
+
+
+process_cleanup = CleanupBatcher(expiring_messages, process_format_notice,
+                                 window=CLEANUP_WINDOW, notice_ttl=NOTICE_SECONDS)
+
+
+async def on_ready():
+    tracker_channels.rebuild(bot.guilds)
+    if BACKFILL_ON_START:
+        process_backfill.start(tracker_text_channels())
+
+# ========================================================================
+# THIS FUNCTION LISTENS TO MESSAGES IN THE CHANNELS "intern-process" AND "new-grad-process"
+# AND REACTS TO THEM BASED ON THE CONTENT
+# ========================================================================
+async def handle_process_message(message):
+    match = PROCESS_PATTERN.match(message.content)
+    if match:
+        try:
+            process_tracker.record(*process_entry(message, match))
+        except Exception as e:
+            print("Failed to record process entry:", e)
+        try:
+            await message.add_reaction('✅')
+        except Exception as e:
+            print(e)
+        if match.group(2).lower() == 'offer':
+            try:
+                await message.channel.send("Congrats 💐!")
+            except Exception as e:
+                print(e)
+    else:
+        # Deleted in a batch with other bad posts in this channel, one notice per member
+        process_cleanup.report(message)
+
+
+def tracker_text_channels(guild=None):
+    guilds = [guild] if guild else bot.guilds
+    channels = []
+    for each in guilds:
+        channels.extend(each.get_channel(channel_id) for channel_id in tracker_channels.by_guild.get(each.id, ()))
+    return [channel for channel in channels if channel is not None]
+
+
+# ========================================================================
+# THIS COMMAND BACKFILLS THE TRACKER FROM THE PROCESS CHANNELS' HISTORY
+# "!backfill" starts a run in the background, "!backfill status" reports on it
+# ========================================================================
+@commands.command(name="backfill")
+@commands.has_permissions(manage_guild=True)
+async def backfill(ctx, action: str = "start"):
+    if action == "status":
+        await ctx.send(process_backfill.status)
+        return
+    channels = tracker_text_channels(ctx.guild)
+    if not channels:
+        await ctx.send("No tracker channels found in this server.")
+    elif process_backfill.start(channels):
+        await ctx.send(f"Backfill started for {', '.join('#' + channel.name for channel in channels)}. "
+                       "Use `!backfill status` to follow it.")
+    else:
+        await ctx.send(f"A backfill is already running. {process_backfill.status}")
+
+
+# ========================================================================
+# THIS FUNCTION ANSWERS "!stats <company>" AND "!stats me" FROM THE TRACKER
+# ========================================================================
+@commands.command(name="stats")
+@commands.guild_only()
+async def stats(ctx, *, query: str = ""):
+    query = query.strip()
+    if not query:
+        await ctx.reply("Usage: `!stats <company>` or `!stats me`")
+        return
+
+    if query.lower() == 'me':
+        rows = process_tracker.user_stats(ctx.guild.id, ctx.author.id)
+        if not rows:
+            await ctx.reply("You haven't posted any `!process` updates yet.")
+            return
+        lines = [f"**{company}**: {stage} ({datetime.fromtimestamp(last_at).strftime('%b %d, %Y')})"
+                 for company, stage, last_at in rows[:20]]
+        await ctx.reply("Your applications:\n" + "\n".join(lines))
+        return
+
+    result = process_tracker.company_stats(ctx.guild.id, query)
+    if result is None:
+        await ctx.reply(f"No `!process` posts for {query} yet.")
+        return
+    stages = ", ".join(f"{stage}: {count}" for stage, count in result['stage_counts'].items())
+    median = result['median_days_to_offer']
+    recent = "\n".join(f"<@{user_id}> {stage} ({datetime.fromtimestamp(created_at).strftime('%b %d')})"
+                       for user_id, stage, created_at in result['recent'])
+    await ctx.reply(
+        f"**{result['company']}**\n"
+        f"Stages: {stages}\n"
+        f"Members: {result['participants']}, offers: {result['offers']} ({result['offer_rate']:.0%})\n"
+        f"Median days from apply to offer: {f'{median:.1f}' if median is not None else 'n/a'}\n"
+        f"Recent:\n{recent}",
+        allowed_mentions=discord.AllowedMentions.none(),
+    )
+
+
+# Keep the tracker channel index in sync with channel changes
+async def on_guild_join(guild):
+    tracker_channels.refresh_guild(guild)
+
+async def on_guild_remove(guild):
+    tracker_channels.forget_guild(guild.id)
+
+async def on_guild_channel_create(channel):
+    tracker_channels.refresh_guild(channel.guild)
+
+async def on_guild_channel_update(before, after):
+    if before.name != after.name:
+        tracker_channels.refresh_guild(after.guild)
+
+async def on_guild_channel_delete(channel):
+    tracker_channels.refresh_guild(channel.guild)
+
+
+def on_settings_change(guild_id, key):
+    if key == "tracker_channels":
+        guild = bot.get_guild(guild_id)
+        if guild:
+            tracker_channels.refresh_guild(guild)
+
+
+async def setup(client):
+    global bot
+    bot = client
+    for listener in (on_ready, on_guild_join, on_guild_remove, on_guild_channel_create,
+                     on_guild_channel_update, on_guild_channel_delete):
+        bot.add_listener(listener)
+    bot.add_command(backfill)
+    bot.add_command(stats)
+    jducs.CHANNEL_ROUTES.append((tracker_channels, 'process', handle_process_message))
+    jducs.STATS_REPORTS.append(process_cleanup.stats)
+    guild_settings.on_change(on_settings_change)
@@ -0,0 +1,244 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import sys
+import threading
+import time
+from datetime import datetime
+
+import git
+
+# metrics.py lives with the bot in J_DUCS_PY
+BOT_DIR = os.getenv('BOT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'J_DUCS_PY'))
+sys.path.append(os.path.abspath(BOT_DIR))
+
+import jducs_farmer
+from metrics import current_rss_mb
+from seen_roles import SeenRolesStore
+from sender import send_role_batches
+
+# ===============================================================
+# Offline benchmark for the farmer pipeline
+#
+#   python benchmark.py                      # 1k, 10k and 100k records
+#   python benchmark.py --sizes 5000 --compare bench_results/<older>.json
+#
+# Runs pull, parse, dedup, format and send against a local git remote and an
+# in-memory channel, so no Discord token or network is needed.
+# ===============================================================
+DEFAULT_SIZES = (1000, 10000, 100000)
+LISTINGS_PATH = os.path.join('.github', 'scripts', 'listings.json')
+COMPANIES = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark Industries', 'Wayne Enterprises']
+LOCATIONS = ['New York, NY', 'San Francisco, CA', 'Seattle, WA', 'Austin, TX', 'Remote in USA', 'Chicago, IL']
+SPONSORSHIPS = ['Offers Sponsorship', 'Does Not Offer Sponsorship', 'U.S. Citizenship is Required', 'Other']
+
+
+# ===============================================================
+# Synthetic data and fakes
+# ===============================================================
+def synthetic_role(index, now, fresh):
+    posted = now - random.randint(0, 20 * 3600) if fresh else now - random.randint(3, 300) * 86400
+    return {
+        "source": "Simplify",
+        "company_name": random.choice(COMPANIES),
+        "id": f"{index:08x}-bench-0000-0000-{random.getrandbits(48):012x}",
+        "title": f"Software Engineer Intern {index}",
+        "active": random.random() > 0.2,
+        "terms": ["Summer 2025"],
+        "date_updated": posted,
+        "url": f"https://example.com/jobs/{index}",
+        "locations": random.sample(LOCATIONS, random.randint(1, 3)),
+        "company_url": "https://example.com",
+        "is_visible": random.random() > 0.05,
+        "sponsorship": random.choice(SPONSORSHIPS),
+        "date_posted": posted,
+    }
+
+
+def generate_listings(path, size, fresh_ratio, start=0):
+    now = int(time.time())
+    roles = [synthetic_role(start + i, now, random.random() < fresh_ratio) for i in range(size)]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as file:
+        json.dump(roles, file, indent=4)
+    return roles
+
+
+def create_remote(remote_path, size, fresh_ratio):
+    repo = git.Repo.init(remote_path)
+    with repo.config_writer() as config:
+        config.set_value('user', 'name', 'benchmark')
+        config.set_value('user', 'email', 'benchmark@localhost')
+    roles = generate_listings(os.path.join(remote_path, LISTINGS_PATH), size, fresh_ratio)
+    repo.git.add('-A')
+    repo.git.commit('-m', f'{size} listings')
+    return repo, roles
+
+
+def append_remote_roles(repo, roles, count, fresh_ratio):
+    now = int(time.time())
+    roles.extend(synthetic_role(len(roles) + i, now, random.random() < fresh_ratio) for i in range(count))
+    with open(os.path.join(repo.working_tree_dir, LISTINGS_PATH), 'w') as file:
+        json.dump(roles, file, indent=4)
+    repo.git.add('-A')
+    repo.git.commit('-m', f'add {count} listings')
+
+
+class FakeMessage:
+    def __init__(self, message_id, embeds):
+        self.id = message_id
+        self.embeds = embeds
+
+
+class FakeChannel:
+    def __init__(self, latency=0.0):
+        self.id = 0
+        self.latency = latency
+        self.messages = []
+
+    async def send(self, content=None, embeds=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        message = FakeMessage(len(self.messages) + 1, embeds or [])
+        self.messages.append(message)
+        return message
+
+
+# ===============================================================
+# Measurement
+# ===============================================================
+class RssSampler:
+    # Polls RSS in a background thread so each stage gets its own peak
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = current_rss_mb()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_mb())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_mb())
+
+
+async def measure(results, stage, records, func, *args):
+    with RssSampler() as sampler:
+        start = time.perf_counter()
+        result = func(*args)
+        if asyncio.iscoroutine(result):
+            result = await result
+        elapsed = time.perf_counter() - start
+    results[stage] = {
+        'seconds': round(elapsed, 6),
+        'records': records,
+        'records_per_second': round(records / elapsed, 1) if elapsed > 0 else None,
+        'peak_rss_mb': round(sampler.peak, 1),
+    }
+    print(f"  {stage:<8} {elapsed:8.3f}s  {results[stage]['records_per_second'] or 0:>12.1f} rec/s  "
+          f"{sampler.peak:8.1f} MB")
+    return result
+
+
+# ===============================================================
+# Pipeline run for one size
+# ===============================================================
+async def run_size(size, workdir, fresh_ratio, send_latency):
+    print(f"{size} records:")
+    remote_path = os.path.join(workdir, 'remote')
+    local_path = os.path.join(workdir, 'local')
+    json_file_path = os.path.join(local_path, LISTINGS_PATH)
+    results = {}
+
+    remote, roles = create_remote(remote_path, size, fresh_ratio)
+    jducs_farmer.clone_or_update_repo(local_path, remote_path)
+    # Touch about 1% of the file so the pull has real objects to transfer
+    append_remote_roles(remote, roles, max(1, size // 100), fresh_ratio)
+    await measure(results, 'pull', len(roles), jducs_farmer.fetch_listings,
+                  local_path, remote_path, json_file_path, None, None)
+
+    now = int(time.time())
+    fresh_roles, _, _, _ = await measure(results, 'parse', len(roles), jducs_farmer.find_new_roles,
+                                         json_file_path, None, {}, jducs_farmer.role_cutoff(None, now), now)
+
+    store = SeenRolesStore(os.path.join(workdir, 'seen_roles.db'))
+    # Pretend half of the fresh roles were announced by an earlier run
+    store.add_many('bench', [role['id'] for role in fresh_roles[::2]])
+    new_roles = await measure(results, 'dedup', len(fresh_roles),
+                              lambda: [role for role in fresh_roles if not store.contains('bench', role['id'])])
+    store.close()
+
+    await measure(results, 'format', len(new_roles), lambda: [jducs_farmer.format_embed(role) for role in new_roles])
+
+    channel = FakeChannel(send_latency)
+    await measure(results, 'send', len(new_roles), send_role_batches,
+                  channel, new_roles, jducs_farmer.format_embed, 'bench')
+    results['send']['messages'] = len(channel.messages)
+    return results
+
+
+def compare(current, previous_file):
+    with open(previous_file) as file:
+        previous = json.load(file)
+    print(f"\nCompared with {previous_file}:")
+    for size, stages in current['sizes'].items():
+        old_stages = previous.get('sizes', {}).get(size)
+        if not old_stages:
+            continue
+        for stage, values in stages.items():
+            old = old_stages.get(stage)
+            if not old or not old['seconds']:
+                continue
+            change = (values['seconds'] - old['seconds']) / old['seconds'] * 100
+            print(f"  {size:>7} {stage:<8} {old['seconds']:8.3f}s -> {values['seconds']:8.3f}s ({change:+.1f}%)")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the role-farming pipeline.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--fresh-ratio', type=float, default=0.01, help="share of roles posted in the last 24h")
+    parser.add_argument('--send-latency', type=float, default=0.0, help="fake seconds per channel.send")
+    parser.add_argument('--output', default='bench_results', help="directory the results JSON is written to")
+    parser.add_argument('--compare', help="earlier results JSON to compare against")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'worker_mode': jducs_farmer.WORKER_MODE,
+        'fresh_ratio': args.fresh_ratio,
+        'sizes': {},
+    }
+    for size in args.sizes:
+        workdir = tempfile.mkdtemp(prefix=f'farmer-bench-{size}-')
+        try:
+            report['sizes'][str(size)] = await run_size(size, workdir, args.fresh_ratio, args.send_latency)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    os.makedirs(args.output, exist_ok=True)
+    output_file = os.path.join(args.output, f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(output_file, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"\nResults saved to {output_file}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+import json
+import os
+from datetime import datetime, time as dt_time, timezone
+
+DEFAULT_JSON_PATH = '.github/scripts/listings.json'
+DEFAULT_CONCURRENCY = 2
+# A feed counts as due if one of its times passed within this many minutes
+SCHEDULE_TOLERANCE_MINUTES = 5
+
+
+# ===============================================================
+# One entry of the feed registry
+# ===============================================================
+class Feed:
+    def __init__(self, name, repo_url, channel_id, local_repo_path=None, json_path=DEFAULT_JSON_PATH,
+                 schedule=('22:00',), filters=None, base_dir=''):
+        self.name = name
+        self.repo_url = repo_url
+        self.channel_id = str(channel_id)
+        # Relative paths are resolved against the directory of the feed registry
+        self.local_repo_path = os.path.join(base_dir, local_repo_path or repo_url.rstrip('/').split('/')[-1])
+        self.json_file_path = os.path.join(self.local_repo_path, *json_path.split('/'))
+        self.schedule = [parse_schedule_time(value) for value in schedule]
+        self.filters = filters or {}
+        # Per-feed files keep the names the two original feeds already used
+        self.feed_state_file = os.path.join(base_dir, f'{name}_feed_state.json')
+        self.legacy_roles_data_file = os.path.join(base_dir, f'{name}_roles_data.json')
+        self.last_started = None
+
+    def is_due(self, now):
+        # Two schedule times a few minutes apart must not run the feed twice
+        if self.last_started and (now - self.last_started).total_seconds() < SCHEDULE_TOLERANCE_MINUTES * 60:
+            return False
+        now_minutes = now.hour * 60 + now.minute
+        for scheduled in self.schedule:
+            passed = (now_minutes - (scheduled.hour * 60 + scheduled.minute)) % (24 * 60)
+            if passed <= SCHEDULE_TOLERANCE_MINUTES:
+                return True
+        return False
+
+    def __repr__(self):
+        return f"Feed({self.name!r}, {self.repo_url!r})"
+
+
+def parse_schedule_time(value):
+    hour, minute = value.split(':')
+    return dt_time(hour=int(hour), minute=int(minute), tzinfo=timezone.utc)
+
+
+def load_feeds(config_file):
+    with open(config_file, 'r') as file:
+        config = json.load(file)
+    base_dir = os.path.dirname(os.path.abspath(config_file))
+    feeds = [Feed(base_dir=base_dir, **entry) for entry in config.get('feeds', [])]
+    names = [feed.name for feed in feeds]
+    if len(names) != len(set(names)):
+        raise ValueError(f"Duplicate feed names in {config_file}: {names}")
+    concurrency = int(config.get('concurrency', DEFAULT_CONCURRENCY))
+    return feeds, concurrency
+
+
+def schedule_times(feeds):
+    return sorted({scheduled for feed in feeds for scheduled in feed.schedule}, key=lambda t: (t.hour, t.minute))
+
+
+def due_feeds(feeds, now=None):
+    now = now or datetime.now(timezone.utc)
+    return [feed for feed in feeds if feed.is_due(now)]
+
+
+# ===============================================================
+# Per-feed filters, applied in the parse stage
+# ===============================================================
+def role_matches_filters(role, filters):
+    if not filters:
+        return True
+
+    sponsorship = filters.get('sponsorship')
+    if sponsorship and role.get('sponsorship') not in sponsorship:
+        return False
+
+    exclude_companies = filters.get('exclude_companies')
+    if exclude_companies:
+        company = (role.get('company_name') or '').lower()
+        if any(excluded.lower() == company for excluded in exclude_companies):
+            return False
+
+    title_keywords = filters.get('title_keywords')
+    if title_keywords:
+        title = (role.get('title') or '').lower()
+        if not any(keyword.lower() in title for keyword in title_keywords):
+            return False
+
+    locations = filters.get('locations')
+    if locations:
+        role_locations = ' | '.join(role.get('locations') or []).lower()
+        if not any(location.lower() in role_locations for location in locations):
+            return False
+
+    return True
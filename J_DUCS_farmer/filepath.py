@@ -1,15 +1,22 @@
 import os
 
-INTERN_REPO_URL = 'https://github.com/SimplifyJobs/Summer2025-Internships'
-INTERN_LOCAL_REPO_PATH = 'Summer2025-Internships'
-INTERN_JSON_FILE_PATH = os.path.join(INTERN_LOCAL_REPO_PATH, '.github', 'scripts', 'listings.json')
-INTERN_ROLES_DATA_FILE = 'intern_roles_data.json'
-INTERN_CHANNEL_ID = "1361926584340185210"
+# Data files live next to the farmer's code, so they stay in place whichever
+# directory the bot is started from (main.py runs from J_DUCS_PY)
+FARMER_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Repo URL, channel, schedule and filters of every feed live in this file
+FEEDS_CONFIG_FILE = os.path.join(FARMER_DIR, 'feeds.json')
 
+SEEN_ROLES_DB = os.path.join(FARMER_DIR, 'seen_roles.db')
 
-NEWGRAD_REPO_URL = 'https://github.com/SimplifyJobs/New-Grad-Positions'
-NEWGRAD_LOCAL_REPO_PATH = 'New-Grad-Positions'
-NEWGRAD_JSON_FILE_PATH = os.path.join(NEWGRAD_LOCAL_REPO_PATH, '.github', 'scripts', 'listings.json')
-NEWGRAD_ROLES_DATA_FILE = 'newgrad_roles_data.json'
-NEWGRAD_CHANNEL_ID = "1361931043413823539"
+# Channel and message of every posted role, for editing the post once the role closes
+POSTED_ROLES_DB = os.path.join(FARMER_DIR, 'posted_roles.db')
+
+# !subscribe filters of every member
+SUBSCRIPTIONS_DB = os.path.join(FARMER_DIR, 'subscriptions.db')
+
+# Full-text index of listed roles, searched by !jobs search
+JOBS_DB = os.path.join(FARMER_DIR, 'jobs.db')
+
+# Announcements not yet posted, with each channel's retry and circuit state
+OUTBOUND_QUEUE_FILE = os.path.join(FARMER_DIR, 'outbound_queue.json')
@@ -1,269 +1,737 @@
+import hashlib
 import json
 import os
-from datetime import datetime, timedelta, timezone, time as dt_time
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime, timezone, time as dt_time
 import git
 import discord
 from discord.ext import tasks, commands
 import asyncio
 from dotenv import load_dotenv
 import gc
-import ijson
+import re
 import filepath
+import metrics
+from seen_roles import SeenRolesStore
+from posted_roles import PostedRolesStore
+from sender import send_role_batches, edit_role_messages, pack_roles, DmFanout
+from outbound import OutboundQueue
+from subscriptions import SubscriptionIndex, parse_subscription, pack_dm_messages
+from feeds import load_feeds, due_feeds, schedule_times, role_matches_filters
+from listings import scan_listings
+from job_index import JobIndex, update_job_index, is_listed, index_record, parse_search, SEARCH_PAGE_SIZE
 
 # ===============================================================
 # Load environment variables from .env file
 # ===============================================================
 load_dotenv() 
-DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
 
 # ===============================================================
 # Constants
 # ===============================================================
-INTERN_REPO_URL = filepath.INTERN_REPO_URL
-INTERN_LOCAL_REPO_PATH = filepath.INTERN_LOCAL_REPO_PATH
-INTERN_JSON_FILE_PATH = filepath.INTERN_JSON_FILE_PATH
-INTERN_ROLES_DATA_FILE = filepath.INTERN_ROLES_DATA_FILE
-INTERN_CHANNEL_ID = filepath.INTERN_CHANNEL_ID
-
-NEWGRAD_REPO_URL = filepath.NEWGRAD_REPO_URL
-NEWGRAD_LOCAL_REPO_PATH = filepath.NEWGRAD_LOCAL_REPO_PATH
-NEWGRAD_JSON_FILE_PATH = filepath.NEWGRAD_JSON_FILE_PATH
-NEWGRAD_ROLES_DATA_FILE = filepath.NEWGRAD_ROLES_DATA_FILE
-NEWGRAD_CHANNEL_ID = filepath.NEWGRAD_CHANNEL_ID
+FEEDS_CONFIG_FILE = os.getenv('FEEDS_CONFIG', filepath.FEEDS_CONFIG_FILE)
+FEEDS, FEED_CONCURRENCY = load_feeds(FEEDS_CONFIG_FILE)
+
+SEEN_ROLES_DB = filepath.SEEN_ROLES_DB
+# Ids older than this are evicted; must stay above the catch-up window below
+SEEN_ROLES_TTL_DAYS = int(os.getenv('SEEN_ROLES_TTL_DAYS', '7'))
+
+# Roles posted in the last day are always considered
+FRESHNESS_SECONDS = 24 * 3600
+# After downtime or a skipped run a feed catches up from its date_posted watermark, at most this far back
+MAX_CATCHUP_HOURS = min(int(os.getenv('MAX_CATCHUP_HOURS', '72')), SEEN_ROLES_TTL_DAYS * 24)
+
+POSTED_ROLES_DB = filepath.POSTED_ROLES_DB
+# Posts of roles that close within this many days are marked closed
+POSTED_ROLES_TTL_DAYS = int(os.getenv('POSTED_ROLES_TTL_DAYS', '60'))
+# Seconds between edits of closed role posts
+CLOSE_EDIT_INTERVAL = float(os.getenv('CLOSE_EDIT_INTERVAL', '0.5'))
+
+# Announcements waiting to be posted, kept across restarts
+OUTBOUND_QUEUE_FILE = filepath.OUTBOUND_QUEUE_FILE
+
+SUBSCRIPTIONS_DB = filepath.SUBSCRIPTIONS_DB
+JOBS_DB = filepath.JOBS_DB
+# Subscription DMs: workers sending at once, and seconds each waits between DMs
+DM_CONCURRENCY = int(os.getenv('DM_CONCURRENCY', '2'))
+DM_INTERVAL = float(os.getenv('DM_INTERVAL', '1.0'))
+
+# Where the blocking fetch/parse stages run: 'thread', 'process' or 'inline'
+WORKER_MODE = os.getenv('FARMER_WORKER_MODE', 'thread').lower()
+WORKER_POOL_SIZE = int(os.getenv('FARMER_WORKER_POOL_SIZE', '2'))
+
+# Prometheus endpoint on 127.0.0.1:METRICS_PORT; disabled when unset
+METRICS_PORT = os.getenv('METRICS_PORT')
 
 # ===============================================================
-# Initialize Discord bot
+# Loaded as an extension of J_DUCS_PY/main.py; setup() sets the bot
 # ===============================================================
-intents = discord.Intents.default()
-intents.message_content = True
-bot = commands.Bot(command_prefix='!', intents=intents)
-running = True
+bot = None
+# The core extension's per-guild settings, and the feed channels guilds added to them
+guild_settings = None
+guild_feed_channels = {}
+worker_pool = None
+seen_store = None
+posted_store = None
+subscriptions = None
+job_index = None
+
+STAGE_SECONDS = metrics.Histogram('farmer_stage_seconds', 'Duration of each feed stage.', ['feed', 'stage'])
+FEED_SECONDS = metrics.Histogram('farmer_feed_seconds', 'Duration of a whole feed check.', ['feed'])
+FEED_FAILURES = metrics.Counter('farmer_feed_failures_total', 'Feed checks that raised.', ['feed'])
+RECORDS_SCANNED = metrics.Counter('farmer_records_scanned_total', 'Listing records parsed.', ['feed'])
+ROLES_POSTED = metrics.Counter('farmer_roles_posted_total', 'Roles posted to Discord.', ['feed'])
+ROLES_CLOSED = metrics.Counter('farmer_roles_closed_total', 'Posted roles marked closed.', ['feed'])
 
 # ===============================================================
 # Retrieve mew roles from the repository
 # ===============================================================
-def clone_or_update_repo(local_repo_path, repo_url):
+def git_objects_size(local_repo_path):
+    # Bytes in the object store; its growth over a sync is what was transferred
+    total = 0
+    for root, _, files in os.walk(os.path.join(local_repo_path, '.git', 'objects')):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def configure_sparse_checkout(repo, sparse_path):
+    # Only the listings file is checked out. The pattern file is written directly
+    # rather than with "git sparse-checkout", whose options vary between git versions.
+    pattern = '/' + sparse_path.lstrip('/') + '\n'
+    pattern_file = os.path.join(repo.git_dir, 'info', 'sparse-checkout')
+    with repo.config_writer() as config:
+        config.set_value('core', 'sparseCheckout', 'true')
+    if os.path.exists(pattern_file):
+        with open(pattern_file, 'r') as file:
+            if file.read() == pattern:
+                return False
+    os.makedirs(os.path.dirname(pattern_file), exist_ok=True)
+    with open(pattern_file, 'w') as file:
+        file.write(pattern)
+    return True
+
+
+def clone_repo(local_repo_path, repo_url, sparse_path):
+    # Partial clone: commits and trees only, blobs are fetched when checked out or diffed
+    repo = git.Repo.clone_from(repo_url, local_repo_path, depth=1, filter='blob:none',
+                               no_checkout=True, single_branch=True)
+    if sparse_path:
+        configure_sparse_checkout(repo, sparse_path)
+    repo.git.checkout(repo.active_branch.name)
+    return repo
+
+
+def update_repo(local_repo_path, sparse_path):
+    # Fetch and move to the remote branch; nothing is merged since the tree is never edited.
+    # Returns None when the checkout is broken and has to be cloned again.
+    try:
+        repo = git.Repo(local_repo_path)
+        branch = repo.active_branch.name
+    except (git.exc.InvalidGitRepositoryError, git.exc.NoSuchPathError, TypeError) as e:
+        print(f"{local_repo_path} is not a usable checkout: {e!r}")
+        return None
+    # Fetch errors (network, GitHub) propagate: the feed fails this run and keeps its checkout
+    repo.git.fetch('origin', branch)
+    try:
+        if sparse_path and configure_sparse_checkout(repo, sparse_path):
+            # Checkouts from before sparse mode: drop everything but the listings file
+            print(f"Switched {local_repo_path} to a sparse checkout of {sparse_path}.")
+        repo.git.reset('--hard', f'origin/{branch}')
+    except git.exc.GitCommandError as e:
+        print(f"Reset of {local_repo_path} failed: {e}")
+        return None
+    return repo
+
+
+def clone_or_update_repo(local_repo_path, repo_url, sparse_path=None):
     print("Cloning or updating repository...")
+    start = time.perf_counter()
+    size_before = git_objects_size(local_repo_path)
+    repo, mode = None, 'clone'
     if os.path.exists(local_repo_path):
-        try:
-            repo = git.Repo(local_repo_path)
-            repo.remotes.origin.pull()
-            # print("Repository updated.")
-        except git.exc.InvalidGitRepositoryError:
-            os.rmdir(local_repo_path)
-            git.Repo.clone_from(repo_url, local_repo_path, depth=5)
-            # print("Repository cloned fresh.")
+        repo, mode = update_repo(local_repo_path, sparse_path), 'fetch'
+        if repo is None:
+            # The whole tree goes; clone_from needs the path gone or empty
+            shutil.rmtree(local_repo_path)
+            size_before, mode = 0, 'reclone'
+    if repo is None:
+        repo = clone_repo(local_repo_path, repo_url, sparse_path)
+    transferred = max(0, git_objects_size(local_repo_path) - size_before)
+    print(f"Synced {local_repo_path} ({mode}) in {time.perf_counter() - start:.2f}s, "
+          f"{transferred / 1024:.1f} KiB transferred.")
+    return repo
+
+
+# ===============================================================
+# Incremental scan: only look at records touched since the last run
+# ===============================================================
+
+
+def load_feed_state(state_file):
+    if not os.path.exists(state_file):
+        return {}
+    try:
+        with open(state_file, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError) as e:
+        print(f"Failed to read feed state {state_file}: {e}")
+        return {}
+
+
+def save_feed_state(state_file, state):
+    # Write to a temp file first so a crash never leaves a half-written state
+    tmp_file = f"{state_file}.tmp"
+    with open(tmp_file, 'w') as file:
+        json.dump(state, file)
+    os.replace(tmp_file, state_file)
+
+
+def listings_git_path(local_repo_path, json_file_path):
+    return os.path.relpath(json_file_path, local_repo_path).replace(os.sep, '/')
+
+
+def listings_fingerprint(repo, local_repo_path, json_file_path):
+    # The blob SHA is free once the pull is done; only hash the file when it is not tracked
+    try:
+        return 'blob:' + (repo.head.commit.tree / listings_git_path(local_repo_path, json_file_path)).hexsha
+    except KeyError:
+        pass
+    digest = hashlib.sha1()
+    with open(json_file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return f'sha1:{os.path.getsize(json_file_path)}:{digest.hexdigest()}'
+
+
+def listing_records(data):
+    # Raw bytes of every top-level record of a listings file, without its braces.
+    # The file is pretty-printed: records are separated by a line holding only the
+    # indent and "}," and one holding only the indent and "{" (a JSON string cannot
+    # span lines), so one split in C finds them all.
+    if not data.startswith(b'[\n'):
+        raise ValueError("listings file is not pretty-printed")
+    opener = data[2:data.find(b'\n', 2)]
+    indent = opener[:-1]
+    if opener != indent + b'{' or indent.strip():
+        raise ValueError("listings file is not pretty-printed")
+    records = data.split(b'\n' + indent + b'},\n' + opener + b'\n')
+    records[0] = records[0][len(b'[\n' + opener + b'\n'):]
+    closer = b'\n' + indent + b'}'
+    last = records[-1].rstrip(b'\n]')
+    if not last.endswith(closer):
+        raise ValueError("listings file is not pretty-printed")
+    records[-1] = last[:-len(closer)]
+    return records
+
+
+def parse_record(record):
+    return json.loads(b'{' + record + b'}')
+
+
+def collect_changed_roles(repo, local_repo_path, json_file_path, last_commit):
+    # Returns (changed records, ids of records deleted from the file), or None when
+    # a full scan is needed. The old and new files are compared record by record, and
+    # only the records that differ are parsed; a git diff of the 2M-line file alone
+    # costs about as much as a full C scan.
+    if not last_commit:
+        return None
+    head_commit = repo.head.commit.hexsha
+    if last_commit == head_commit:
+        print("No new commits since the last run.")
+        return [], []
+    listings_path = listings_git_path(local_repo_path, json_file_path)
+    try:
+        old_data = repo.git.cat_file('blob', f'{last_commit}:{listings_path}', stdout_as_string=False)
+    except git.exc.GitCommandError as e:
+        # The old commit is gone (history rewritten, re-clone)
+        print(f"Cannot read listings at {last_commit[:8]}: {e}")
+        return None
+    try:
+        with open(json_file_path, 'rb') as file:
+            new_records = listing_records(file.read())
+        old_records = set(listing_records(old_data))
+        roles = [parse_record(record) for record in new_records if record not in old_records]
+        # Old versions of changed records are here too; only ids missing from the new file count
+        old_ids = {parse_record(record)['id'] for record in old_records.difference(new_records)}
+    except (ValueError, KeyError) as e:
+        print(f"Incremental scan failed, falling back to a full scan: {e}")
+        return None
+    removed_ids = sorted(old_ids - {role['id'] for role in roles})
+    print(f"Incremental scan: {len(roles)} changed and {len(removed_ids)} removed records since {last_commit[:8]}.")
+    return roles, removed_ids
+
+
+# ===============================================================
+# Pipeline stages, run off the event loop by run_stage()
+# ===============================================================
+def fetch_listings(local_repo_path, repo_url, json_file_path, last_commit, last_fingerprint):
+    # Only plain data is returned so the stage also works in a process pool.
+    # changed_roles is None when a full scan is needed; removed_ids are the ids
+    # of records deleted from the file since last_commit.
+    repo = clone_or_update_repo(local_repo_path, repo_url, listings_git_path(local_repo_path, json_file_path))
+    head_commit = repo.head.commit.hexsha
+    fingerprint = listings_fingerprint(repo, local_repo_path, json_file_path)
+    if fingerprint == last_fingerprint:
+        return head_commit, fingerprint, [], []
+    changed = collect_changed_roles(repo, local_repo_path, json_file_path, last_commit)
+    if changed is None:
+        return head_commit, fingerprint, None, []
+    changed_roles, removed_ids = changed
+    return head_commit, fingerprint, changed_roles, removed_ids
+
+
+def role_cutoff(watermark, now):
+    # Oldest date_posted to announce: back to the watermark after an outage, but never
+    # less than the usual day (roles can land in the file after later-dated ones) and
+    # never more than the catch-up limit. Repeats are dropped by the seen store.
+    cutoff = now - FRESHNESS_SECONDS
+    if watermark:
+        cutoff = min(cutoff, watermark)
+    return max(cutoff, now - MAX_CATCHUP_HOURS * 3600)
+
+
+def is_new_role(role, filters, cutoff):
+    # Plain epoch comparison first: it rejects almost every record
+    date_posted = role.get('date_posted')
+    if not date_posted or date_posted < cutoff:
+        return False
+    return bool(role.get('is_visible') and role.get('active') and role_matches_filters(role, filters))
+
+
+def find_new_roles(json_file_path, changed_roles, filters, cutoff, now):
+    # Returns (new roles, records parsed, highest date_posted seen that is not in the future,
+    # listed records for the job index rebuild or None when only changed records were parsed)
+    latest = 0
+    listed = []
+
+    def keep(role):
+        nonlocal latest
+        date_posted = role.get('date_posted') or 0
+        if latest < date_posted <= now:
+            latest = date_posted
+        if is_listed(role):
+            listed.append(index_record(role))
+        return is_new_role(role, filters, cutoff)
+
+    if changed_roles is None:
+        print("Running a full scan of the listings file.")
+        roles, scanned = scan_listings(json_file_path, keep)
+        return roles, scanned, latest, listed
+    roles = [role for role in changed_roles if keep(role)]
+    return roles, len(changed_roles), latest, None
+
+
+def get_worker_pool():
+    global worker_pool
+    if worker_pool is None:
+        if WORKER_MODE == 'process':
+            worker_pool = ProcessPoolExecutor(max_workers=WORKER_POOL_SIZE)
+        else:
+            worker_pool = ThreadPoolExecutor(max_workers=WORKER_POOL_SIZE, thread_name_prefix='farmer')
+    return worker_pool
+
+
+async def run_stage(feed, name, func, *args):
+    # The event loop only awaits the result, so gateway heartbeats keep flowing
+    start = time.perf_counter()
+    if WORKER_MODE == 'inline':
+        result = func(*args)
     else:
-        git.Repo.clone_from(repo_url, local_repo_path, depth=2)
-        # print("Repository cloned fresh.")
-    
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(get_worker_pool(), func, *args)
+    elapsed = time.perf_counter() - start
+    STAGE_SECONDS.observe(elapsed, feed, name)
+    print(f"Stage '{name}' took {elapsed:.2f}s ({WORKER_MODE}).")
+    return result
+
+
+def get_seen_store():
+    global seen_store
+    if seen_store is None:
+        seen_store = SeenRolesStore(SEEN_ROLES_DB)
+        for feed in FEEDS:
+            seen_store.migrate_json(feed.name, feed.legacy_roles_data_file)
+    return seen_store
+
+
+def get_posted_store():
+    global posted_store
+    if posted_store is None:
+        posted_store = PostedRolesStore(POSTED_ROLES_DB)
+    return posted_store
+
+
+def get_subscriptions():
+    global subscriptions
+    if subscriptions is None:
+        subscriptions = SubscriptionIndex(SUBSCRIPTIONS_DB)
+    return subscriptions
+
 
+def get_job_index():
+    # Read connection for !jobs search; the index stage writes through its own
+    global job_index
+    if job_index is None:
+        job_index = JobIndex(JOBS_DB)
+    return job_index
 
-def iter_json(json_file_path):
-    print(f"Reading JSON file from {json_file_path} iteratively...")
-    with open(json_file_path, 'r') as file:
-        # 'item' tells ijson to iterate over the items of the top-level array
-        for role in ijson.items(file, 'item'):
-            # print(f"Processing role: {role['title']} at {role['company_name']}")
-            yield role
 
+async def get_user(user_id):
+    return bot.get_user(user_id) or await bot.fetch_user(user_id)
 
-async def check_for_new_roles(local_repo_path, repo_url, roles_data_file, json_file_path, channel_id):
-    global running
-    print("Checking for new roles...")
+
+dm_fanout = DmFanout(get_user, concurrency=DM_CONCURRENCY, interval=DM_INTERVAL)
+metrics.Gauge('farmer_dm_queue_depth', 'Subscription DMs waiting to be sent.', func=lambda: dm_fanout.depth)
+
+
+async def deliver_announcement(entry):
+    return await send_roles(entry['roles'], entry['channel_id'], entry['feed'])
+
+
+def record_announcement(entry, sent):
+    ROLES_POSTED.inc(entry['feed'], amount=len(entry['roles']))
+    get_posted_store().add(entry['feed'], entry['channel_id'], sent)
+
+
+outbound = OutboundQueue(OUTBOUND_QUEUE_FILE, deliver_announcement, on_delivered=record_announcement)
+metrics.Gauge('farmer_outbound_queue_depth', 'Announcements waiting to be posted.', func=lambda: outbound.depth)
+metrics.Gauge('farmer_outbound_open_circuits', 'Channels whose circuit is open.', func=lambda: outbound.open_circuits())
+
+
+def notify_subscribers(feed, roles):
+    # Matches the whole batch against the index once, then queues one DM per member
+    index = get_subscriptions()
+    if not roles or not len(index):
+        return
+    start = time.perf_counter()
+    matches = index.match_batch(roles)
+    for user_id, user_roles in matches.items():
+        dm_fanout.submit(user_id, pack_dm_messages(
+            f"New {feed.name} roles matching your subscriptions:\n", [format_dm_line(role) for role in user_roles]
+        ))
+    print(f"Matched {len(roles)} {feed.name} roles against {len(index)} subscriptions in "
+          f"{time.perf_counter() - start:.3f}s, queued DMs for {len(matches)} members.")
+
+
+async def check_for_new_roles(feed):
+    print(f"Checking for new {feed.name} roles...")
     
-    clone_or_update_repo(local_repo_path, repo_url)
+    feed_state = load_feed_state(feed.feed_state_file)
+    head_commit, fingerprint, changed_roles, removed_ids = await run_stage(
+        feed.name, 'fetch', fetch_listings, feed.local_repo_path, feed.repo_url, feed.json_file_path,
+        feed_state.get('last_commit'), feed_state.get('listings_fingerprint')
+    )
+
+    if fingerprint == feed_state.get('listings_fingerprint'):
+        print(f"No change in {feed.name} listings ({fingerprint}), skipping parse and send.")
+        # Still runs so an empty !jobs index gets built; otherwise a no-op
+        await run_stage(feed.name, 'index', update_job_index, JOBS_DB, feed.name, feed.json_file_path,
+                        changed_roles, removed_ids)
+        feed_state['last_commit'] = head_commit
+        save_feed_state(feed.feed_state_file, feed_state)
+        return
     
-    # Load previously processed roles as a set of role IDs
-    if os.path.exists(roles_data_file):
-        with open(roles_data_file, 'r') as file:
-            processed_roles_list = json.load(file)
-            processed_roles = set(tuple(item) for item in processed_roles_list)
-        # print("Previous data loaded.")
-    else:
-        processed_roles = set()
-        # print("No previous data found.")
-
-    new_roles = []
-
-    # print(f"Reading JSON file from {json_file_path} iteratively...")
-    with open(json_file_path, 'r') as file:
-        for role in ijson.items(file, 'item'):
-            # print(f"Processing role: {role['title']} at {role['company_name']}")
-            role_id = role['id']
-            if role_id in processed_roles:
-                continue
-
-            if role.get('is_visible') and role.get('active'):
-                # print(f"Role {role['title']} is visible and active.")
-                date_posted = role.get('date_posted')
-                created_at_str = datetime.fromtimestamp(date_posted).isoformat() if date_posted else None
-                if created_at_str:
-                    try:
-                        created_at = datetime.fromisoformat(created_at_str)
-                        # print(f"Created at: {created_at}")
-                        if datetime.now() - created_at <= timedelta(hours=24):
-                            new_roles.append(role)
-                            processed_roles.add(role_id)
-                            # print(f"New role found: {role['title']} at {role['company_name']}")
-                    except Exception as e:
-                        print(f"Error parsing created_at for role {role['title']}: {e}")
-
-    for role in new_roles:
-        message = format_message(role)
-        try:
-            await send_message(message, channel_id)
-        except Exception as e:
-            print(f"Channel error encountered: {e}")
-            running = False
-            # DM the server owner for each guild the bot is in
-            for guild in bot.guilds:
-                if guild.owner:
-                    try:
-                        await guild.owner.send(
-                            f"Error sending message to channel {channel_id}: '{e}'. "
-                            "The bot has stopped sending new messages."
-                        )
-                    except Exception as dm_error:
-                        print(f"Failed to DM owner for guild {guild.id}: {dm_error}")
-            # Stop sending new messages forever
-            break
-        # Wait for 2 seconds before sending the next message
-        await asyncio.sleep(2)
-
-    with open(roles_data_file, 'w') as file:
-        json.dump(list(processed_roles), file)
-    print("Updated previous data with roles from the last 24 hours.")
+    # Computed once per run; the parse stage only compares integers against it
+    now = int(time.time())
+    watermark = feed_state.get('date_posted_watermark')
+    cutoff = role_cutoff(watermark, now)
+    if cutoff < now - FRESHNESS_SECONDS:
+        print(f"Catching up {feed.name} roles posted since "
+              f"{datetime.fromtimestamp(cutoff, timezone.utc):%Y-%m-%d %H:%M} UTC.")
+    fresh_roles, scanned, latest, listed_roles = await run_stage(
+        feed.name, 'parse', find_new_roles, feed.json_file_path, changed_roles, feed.filters, cutoff, now
+    )
+    RECORDS_SCANNED.inc(feed.name, amount=scanned)
+    # Keeps the !jobs search index in step with the listings. After a full scan it is
+    # rebuilt from the listed records the parse stage collected, not scanned again.
+    await run_stage(feed.name, 'index', update_job_index, JOBS_DB, feed.name, feed.json_file_path,
+                    changed_roles, removed_ids, listed_roles)
+
+    # Drop roles that an earlier run already announced
+    store = get_seen_store()
+    new_roles = [role for role in fresh_roles if not store.contains(feed.name, role['id'])]
+
+    # Queued on disk before the ids are recorded as seen; the outbound queue
+    # retries each channel until the roles are posted
+    channel_ids = feed_channel_ids(feed)
+    if new_roles:
+        batches = [batch for batch, _ in pack_roles(new_roles, format_embed)]
+        for channel_id in channel_ids:
+            outbound.submit(feed.name, channel_id, batches)
+        print(f"Queued {len(batches)} messages of {feed.name} roles for {len(channel_ids)} channels "
+              f"({outbound.stats()}).")
+
+    store.add_many(feed.name, [role['id'] for role in new_roles])
+    print(f"Recorded {len(new_roles)} new {feed.name} roles as seen.")
+    notify_subscribers(feed, new_roles)
+
+    feed_state['last_commit'] = head_commit
+    feed_state['listings_fingerprint'] = fingerprint
+    feed_state['date_posted_watermark'] = max(watermark or 0, latest) or None
+    save_feed_state(feed.feed_state_file, feed_state)
+
+    # Runs after the state is saved so a failed edit never repeats the announcements
+    try:
+        await close_posted_roles(feed)
+    except Exception as e:
+        print(f"Failed to close posted {feed.name} roles: {e}")
+
+
 
+async def close_posted_roles(feed):
+    # A posted role that the job index no longer lists has closed or been removed.
+    # Its messages come from the posted-roles index, never from channel history.
+    store = get_posted_store()
+    index = get_job_index()
+    open_ids = store.open_role_ids(feed.name)
+    if not open_ids or index.count(feed.name) == 0:
+        return
+    start = time.perf_counter()
+    closed = {role_id for role_id in open_ids if not index.contains(feed.name, role_id)}
+    if not closed:
+        return
+    edits, closed_by_message = [], {}
+    for (channel_id, message_id), embeds in store.messages_for(feed.name, closed).items():
+        try:
+            channel = await get_channel(channel_id)
+        except discord.HTTPException as e:
+            print(f"Cannot reach channel {channel_id} to close roles: {e}")
+            continue
+        edits.append((channel, message_id, [
+            format_closed_embed(embed) if was_closed or role_id in closed else discord.Embed.from_dict(embed)
+            for _, role_id, embed, was_closed in embeds
+        ]))
+        closed_by_message[message_id] = [role_id for _, role_id, _, _ in embeds if role_id in closed]
+    for message_id in await edit_role_messages(edits, feed.name, interval=CLOSE_EDIT_INTERVAL):
+        store.mark_closed(message_id, closed_by_message[message_id])
+        ROLES_CLOSED.inc(feed.name, amount=len(closed_by_message[message_id]))
+    elapsed = time.perf_counter() - start
+    STAGE_SECONDS.observe(elapsed, feed.name, 'close')
+    print(f"Marked {len(closed)} closed {feed.name} roles in {len(edits)} messages in {elapsed:.2f}s.")
 
 
 # ===============================================================
 # Format message for Discord
 # ===============================================================
-def format_message(role):
-    try:
-        location_str = ', '.join(role['locations']) if role['locations'] else 'Not specified'
-        return f"""
->>> # {role['company_name']} just posted a new role!
+def format_dm_line(role):
+    location_str = ', '.join(role.get('locations') or []) or 'Not specified'
+    return (f"- **{role['company_name']}**: [{role['title']}](<{role['url']}>) | {location_str} "
+            f"| `{role.get('sponsorship')}`\n")
 
-### Role:
-[{role['title']}]({role['url']})
 
-### Location:
-{location_str}
+def format_embed(role):
+    location_str = ', '.join(role.get('locations') or []) or 'Not specified'
+    embed = discord.Embed(
+        title=f"{role['company_name']} just posted a new role!"[:256],
+        description=f"[{role['title']}]({role['url']})",
+    )
+    embed.add_field(name="Location", value=location_str[:1024], inline=False)
+    embed.add_field(name="Sponsorship", value=f"`{role.get('sponsorship')}`", inline=True)
+    # The listing's own date: catch-up runs and queued retries post roles days later
+    date_posted = role.get('date_posted')
+    posted = datetime.fromtimestamp(date_posted, timezone.utc) if date_posted else datetime.now(timezone.utc)
+    embed.add_field(name="Posted on", value=posted.strftime('%B, %d'), inline=True)
+    return embed
 
-### Sponsorship: `{role['sponsorship']}`
-### Posted on: {datetime.now().strftime('%B, %d')}
-"""
-    except Exception as e:
-        return f"Error formatting message: {e}"
 
+CLOSED_PREFIX = '[Closed] '
 
-async def send_message(message, channel_id):
-    try:
-        # print(f"Sending message to channel ID {channel_id}...")
-        channel = bot.get_channel(int(channel_id))
-        if channel is None:
-            # print(f"Channel {channel_id} not in cache, attempting to fetch...")
-            try:
-                channel = await bot.fetch_channel(int(channel_id))
-            except Exception as e:
-                print(f"Error fetching channel {channel_id}: {e}")
-                return
-
-        await channel.send(message)
-        # print(f"Successfully sent message to channel {channel_id}")
-        await asyncio.sleep(2)
-        
-    except Exception as e:
-        print(f"Error sending message to channel {channel_id}: {e}")
-        return
+
+def format_closed_embed(data):
+    # The posted embed, struck through and greyed out
+    embed = discord.Embed.from_dict(data)
+    if not (embed.title or '').startswith(CLOSED_PREFIX):
+        embed.title = (CLOSED_PREFIX + (embed.title or ''))[:256]
+        embed.description = f"~~{embed.description}~~" if embed.description else embed.description
+    embed.colour = discord.Colour.dark_grey()
+    return embed
+
+
+def refresh_guild_feed_channels():
+    # feed name -> channel ids from every guild's "!config set feed_channels"
+    channels = {}
+    for guild_id in guild_settings.guilds:
+        for feed_name, channel_id in (guild_settings.get(guild_id, 'feed_channels') or {}).items():
+            channels.setdefault(feed_name, []).append(str(channel_id))
+    guild_feed_channels.clear()
+    guild_feed_channels.update(channels)
+
+
+def on_settings_change(guild_id, key):
+    if key == 'feed_channels':
+        refresh_guild_feed_channels()
+
+
+def feed_channel_ids(feed):
+    # All channels the feed posts to: its own plus every guild's
+    return list(dict.fromkeys([feed.channel_id] + guild_feed_channels.get(feed.name, [])))
+
+
+async def get_channel(channel_id):
+    channel = bot.get_channel(int(channel_id))
+    if channel is None:
+        # print(f"Channel {channel_id} not in cache, attempting to fetch...")
+        channel = await bot.fetch_channel(int(channel_id))
+    return channel
+
+
+async def send_roles(roles, channel_id, feed):
+    # Packs up to 10 roles per message; errors propagate to the caller
+    channel = await get_channel(channel_id)
+    return await send_role_batches(channel, roles, format_embed, feed)
 
 
 
 # ===============================================================
 # Discord bot events
 # ===============================================================
-@bot.event
 async def on_ready():
-    print(f'Logged in as {bot.user}')
-    scheduled_intern_role_check.start()
-    scheduled_clean_intern_roles_data.start()
+    if METRICS_PORT:
+        await metrics.start_metrics_server(int(METRICS_PORT))
+    # Posts whatever was still queued when the bot stopped
+    outbound.start()
+    # on_ready fires again after every reconnect, so only start the loops once
+    # tasks.loop rejects an empty list of times, so with no feeds there is nothing to schedule
+    if FEEDS and not scheduled_feed_check.is_running():
+        scheduled_feed_check.change_interval(time=schedule_times(FEEDS))
+        scheduled_feed_check.start()
+    if not scheduled_evict_seen_roles.is_running():
+        scheduled_evict_seen_roles.start()
+
+
+# ------------- Subscriptions -------------------
+@commands.command(name='subscribe')
+async def subscribe(ctx, *, text: str = ''):
+    try:
+        subscription = get_subscriptions().add(ctx.author.id, parse_subscription(text))
+    except ValueError as e:
+        await ctx.reply(f"{e}\nExample: `!subscribe company=Google, Meta keyword=backend location=remote sponsorship=yes`")
+        return
+    await ctx.reply(f"Subscribed {subscription.describe()}. Matching roles will be sent to you by DM.")
 
-    scheduled_newgrad_role_check.start()
-    scheduled_clean_newgrad_roles_data.start()
 
+@commands.command(name='subscriptions')
+async def list_subscriptions(ctx):
+    mine = get_subscriptions().for_user(ctx.author.id)
+    if not mine:
+        await ctx.reply("You have no subscriptions. Add one with `!subscribe`.")
+        return
+    await ctx.reply("Your subscriptions:\n" + "\n".join(subscription.describe() for subscription in mine))
 
-# ------------- Intern Roles -------------------
-@tasks.loop(time=dt_time(hour=22, minute=0, tzinfo=timezone.utc))
-async def scheduled_intern_role_check():
-    print("Scheduled intern task running...")
-    if running:
-        await check_for_new_roles(INTERN_LOCAL_REPO_PATH, INTERN_REPO_URL, INTERN_ROLES_DATA_FILE, INTERN_JSON_FILE_PATH, INTERN_CHANNEL_ID)
-    gc.collect()
 
-@scheduled_intern_role_check.before_loop
-async def before_scheduled_intern_role_check():
-    await bot.wait_until_ready()
+@commands.command(name='unsubscribe')
+async def unsubscribe(ctx, which: str = 'all'):
+    if which != 'all' and not which.lstrip('#').isdigit():
+        await ctx.reply("Usage: `!unsubscribe <id>` or `!unsubscribe all`")
+        return
+    removed = get_subscriptions().remove(ctx.author.id, None if which == 'all' else int(which.lstrip('#')))
+    await ctx.reply(f"Removed {removed} subscription{'s' if removed != 1 else ''}.")
 
-@tasks.loop(time=dt_time(hour=23, minute=0, tzinfo=timezone.utc))
-async def scheduled_clean_intern_roles_data():
-    print("Cleaning intern roles data file...")
-    if os.path.exists(INTERN_ROLES_DATA_FILE):
+
+# ------------- Job search -------------------
+@commands.command(name='jobs')
+async def jobs(ctx, action: str = '', *, text: str = ''):
+    usage = "Usage: `!jobs search <query> [location=<place>] [sponsorship=yes|no|citizen] [page=<n>]`"
+    if action != 'search':
+        await ctx.reply(usage)
+        return
+    try:
+        query, location, sponsorship, page = parse_search(text)
+    except ValueError as e:
+        await ctx.reply(f"{e}\n{usage}")
+        return
+    if not query and not location:
+        await ctx.reply(usage)
+        return
+
+    start = time.perf_counter()
+    rows, total = get_job_index().search(query, location, sponsorship, page)
+    elapsed = time.perf_counter() - start
+    if not total:
+        await ctx.reply(f"No open roles match `{query or location}`.")
+        return
+    pages = (total + SEARCH_PAGE_SIZE - 1) // SEARCH_PAGE_SIZE
+    lines = [f"**{company}**: [{title}](<{url}>) | {locations or 'Not specified'} | `{role_sponsorship}` ({feed})"
+             for feed, company, title, locations, role_sponsorship, url, _ in rows]
+    embed = discord.Embed(title=f"Open roles matching '{query or location}'"[:256],
+                          description="\n".join(lines)[:4096] or "No results on this page.")
+    next_page = f" | add page={page + 1} for more" if page < pages else ""
+    embed.set_footer(text=f"Page {page}/{pages} | {total} roles | {elapsed * 1000:.0f}ms{next_page}")
+    await ctx.reply(embed=embed)
+
+
+# ------------- Feed Roles -------------------
+feed_semaphore = asyncio.Semaphore(FEED_CONCURRENCY)
+
+
+async def run_feed(feed):
+    feed.last_started = datetime.now(timezone.utc)
+    async with feed_semaphore:
+        start = time.perf_counter()
         try:
-            with open(INTERN_ROLES_DATA_FILE, 'w') as file:
-                json.dump([], file)
-            # print("Roles data file cleaned.")
+            await check_for_new_roles(feed)
         except Exception as e:
-            print(f"Failed to clean roles data file: {e}")
-    else:
-        # print("Roles data file does not exist; nothing to clean.")
-        pass
+            FEED_FAILURES.inc(feed.name)
+            print(f"Feed {feed.name} failed: {e}")
+        elapsed = time.perf_counter() - start
+        FEED_SECONDS.observe(elapsed, feed.name)
+        print(f"Feed {feed.name} finished in {elapsed:.2f}s.")
 
-@scheduled_clean_intern_roles_data.before_loop
-async def before_clean_Intern_roles_data():
-    await bot.wait_until_ready()
 
-
-# ------------- Newgrad Roles -------------------
-@tasks.loop(time=dt_time(hour=22, minute=15, tzinfo=timezone.utc))
-async def scheduled_newgrad_role_check():
-    print("Scheduled newgrad task running...")
-    if running:
-        await check_for_new_roles(NEWGRAD_LOCAL_REPO_PATH, NEWGRAD_REPO_URL, NEWGRAD_ROLES_DATA_FILE, NEWGRAD_JSON_FILE_PATH, NEWGRAD_CHANNEL_ID)
+# The real times are set from the feed registry in on_ready
+@tasks.loop(time=dt_time(hour=22, minute=0, tzinfo=timezone.utc))
+async def scheduled_feed_check():
+    feeds = due_feeds(FEEDS)
+    print(f"Scheduled feed check running for: {', '.join(feed.name for feed in feeds) or 'nothing'}")
+    if feeds:
+        await asyncio.gather(*(run_feed(feed) for feed in feeds))
     gc.collect()
 
-@scheduled_newgrad_role_check.before_loop
-async def before_scheduled_newgrad_role_check():
+@scheduled_feed_check.before_loop
+async def before_scheduled_feed_check():
     await bot.wait_until_ready()
 
-@tasks.loop(time=dt_time(hour=23, minute=15, tzinfo=timezone.utc))
-async def scheduled_clean_newgrad_roles_data():
-    print("Cleaning newgrad roles data file...")
-    if os.path.exists(NEWGRAD_ROLES_DATA_FILE):
-        try:
-            with open(NEWGRAD_ROLES_DATA_FILE, 'w') as file:
-                json.dump([], file)
-            # print("Roles data file cleaned.")
-        except Exception as e:
-            print(f"Failed to clean roles data file: {e}")
-    else:
-        # print("Roles data file does not exist; nothing to clean.")
-        pass
 
-@scheduled_clean_newgrad_roles_data.before_loop
-async def before_clean_newgrad_roles_data():
+# ------------- Seen roles eviction -------------------
+@tasks.loop(time=dt_time(hour=23, minute=0, tzinfo=timezone.utc))
+async def scheduled_evict_seen_roles():
+    print("Evicting old seen roles...")
+    try:
+        evicted = get_seen_store().evict_older_than(SEEN_ROLES_TTL_DAYS * 24 * 3600)
+        print(f"Evicted {evicted} role ids older than {SEEN_ROLES_TTL_DAYS} days.")
+        evicted = get_posted_store().evict_older_than(POSTED_ROLES_TTL_DAYS * 24 * 3600)
+        print(f"Evicted {evicted} role posts older than {POSTED_ROLES_TTL_DAYS} days.")
+    except Exception as e:
+        print(f"Failed to evict seen roles: {e}")
+
+@scheduled_evict_seen_roles.before_loop
+async def before_evict_seen_roles():
     await bot.wait_until_ready()
 
 
 # ===============================================================
-# Run the bot
+# Extension entry point
 # ===============================================================
-print("Starting bot...")
-if DISCORD_TOKEN and INTERN_CHANNEL_ID:
-    bot.run(DISCORD_TOKEN)
-else:
-    if not DISCORD_TOKEN:
-        print("Please provide your Discord token.")
-    if not INTERN_CHANNEL_ID:
-        print("Please provide your channel IDs.")
+async def setup(client):
+    global bot, guild_settings
+    bot = client
+    # "feeds" in bot_config.json picks which registry entries this bot runs; all of them when absent
+    enabled = bot.config.get('feeds')
+    if enabled is not None:
+        FEEDS[:] = [feed for feed in FEEDS if feed.name in enabled]
+    if not FEEDS:
+        print(f"No feeds enabled; add them to {FEEDS_CONFIG_FILE} and bot_config.json.")
+    print(f"Feeds: {', '.join(feed.name for feed in FEEDS) or 'none'}")
+    # Owned by the core extension, which main.py always loads first
+    from jducs import guild_settings
+    refresh_guild_feed_channels()
+    guild_settings.on_change(on_settings_change)
+    bot.add_listener(on_ready)
+    for command in (subscribe, list_subscriptions, unsubscribe, jobs):
+        bot.add_command(command)
@@ -0,0 +1,187 @@
+import re
+import sqlite3
+import time
+
+from listings import scan_listings
+from subscriptions import ARGUMENT, SPONSORSHIP_CHOICES
+
+SEARCH_PAGE_SIZE = 8
+# Only what the jobs table stores is kept from a listed record
+INDEX_FIELDS = ('id', 'company_name', 'title', 'locations', 'sponsorship', 'url', 'date_posted')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    feed TEXT NOT NULL,
+    role_id TEXT NOT NULL,
+    company TEXT NOT NULL,
+    title TEXT NOT NULL,
+    locations TEXT NOT NULL,
+    sponsorship TEXT,
+    url TEXT,
+    date_posted INTEGER,
+    UNIQUE (feed, role_id)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_date_posted ON jobs (date_posted);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(
+    company, title, locations, content='jobs', content_rowid='id', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS jobs_ai AFTER INSERT ON jobs BEGIN
+    INSERT INTO jobs_fts (rowid, company, title, locations) VALUES (new.id, new.company, new.title, new.locations);
+END;
+CREATE TRIGGER IF NOT EXISTS jobs_ad AFTER DELETE ON jobs BEGIN
+    INSERT INTO jobs_fts (jobs_fts, rowid, company, title, locations)
+    VALUES ('delete', old.id, old.company, old.title, old.locations);
+END;
+CREATE TRIGGER IF NOT EXISTS jobs_au AFTER UPDATE ON jobs BEGIN
+    INSERT INTO jobs_fts (jobs_fts, rowid, company, title, locations)
+    VALUES ('delete', old.id, old.company, old.title, old.locations);
+    INSERT INTO jobs_fts (rowid, company, title, locations) VALUES (new.id, new.company, new.title, new.locations);
+END;
+'''
+
+WORD = re.compile(r'\w+')
+FIRST_OPTION = re.compile(r'\b\w+\s*=')
+
+
+def is_listed(role):
+    return bool(role.get('active')) and bool(role.get('is_visible'))
+
+
+def index_record(role):
+    return {field: role.get(field) for field in INDEX_FIELDS}
+
+
+def match_expression(text, column=None):
+    # Every word has to appear, as a prefix: "soft eng" finds "Software Engineer"
+    words = WORD.findall(text.lower())
+    prefix = f'{column} : ' if column else ''
+    return ' AND '.join(f'{prefix}"{word}"*' for word in words)
+
+
+def parse_search(text):
+    # "backend engineer location=new york sponsorship=yes page=2" -> (query, location, sponsorship, page)
+    first = FIRST_OPTION.search(text)
+    query = text[:first.start()] if first else text
+    options = {key.lower(): value.strip() for key, value in ARGUMENT.findall(text[first.start():])} if first else {}
+    sponsorship = options.get('sponsorship', '').lower()
+    if sponsorship and sponsorship not in SPONSORSHIP_CHOICES:
+        raise ValueError(f"Sponsorship must be one of: {', '.join(SPONSORSHIP_CHOICES)}.")
+    page = options.get('page', '1')
+    if not page.isdigit() or int(page) < 1:
+        raise ValueError("Page must be a positive number.")
+    return query.strip(), options.get('location', ''), SPONSORSHIP_CHOICES.get(sponsorship), int(page)
+
+
+# ===============================================================
+# Full-text index of the active, visible roles of every feed
+# ===============================================================
+class JobIndex:
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def count(self, feed=None):
+        if feed is None:
+            return self.conn.execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
+        return self.conn.execute('SELECT COUNT(*) FROM jobs WHERE feed = ?', (feed,)).fetchone()[0]
+
+    def contains(self, feed, role_id):
+        # One lookup on the (feed, role_id) unique index
+        return self.conn.execute(
+            'SELECT 1 FROM jobs WHERE feed = ? AND role_id = ?', (feed, role_id)
+        ).fetchone() is not None
+
+    def _upsert(self, feed, role):
+        self.conn.execute(
+            'INSERT INTO jobs (feed, role_id, company, title, locations, sponsorship, url, date_posted) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (feed, role_id) DO UPDATE SET company = excluded.company, title = excluded.title, '
+            'locations = excluded.locations, sponsorship = excluded.sponsorship, url = excluded.url, '
+            'date_posted = excluded.date_posted',
+            (feed, role['id'], role.get('company_name') or '', role.get('title') or '',
+             ', '.join(role.get('locations') or []), role.get('sponsorship'), role.get('url'),
+             role.get('date_posted')),
+        )
+
+    def apply_changes(self, feed, roles, removed_ids=()):
+        # Changed records from the incremental diff: listed ones are upserted, the rest
+        # removed, along with the records deleted from the file
+        added = removed = 0
+        with self.conn:
+            for role_id in removed_ids:
+                removed += self.conn.execute(
+                    'DELETE FROM jobs WHERE feed = ? AND role_id = ?', (feed, role_id)
+                ).rowcount
+            for role in roles:
+                if is_listed(role):
+                    self._upsert(feed, role)
+                    added += 1
+                else:
+                    removed += self.conn.execute(
+                        'DELETE FROM jobs WHERE feed = ? AND role_id = ?', (feed, role['id'])
+                    ).rowcount
+        return added, removed
+
+    def rebuild(self, feed, roles):
+        # Full snapshot: the feed's rows become exactly the listed roles
+        with self.conn:
+            self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS listed (role_id TEXT PRIMARY KEY)')
+            self.conn.execute('DELETE FROM listed')
+            self.conn.executemany('INSERT OR IGNORE INTO listed VALUES (?)', ((role['id'],) for role in roles))
+            removed = self.conn.execute(
+                'DELETE FROM jobs WHERE feed = ? AND role_id NOT IN (SELECT role_id FROM listed)', (feed,)
+            ).rowcount
+            for role in roles:
+                self._upsert(feed, role)
+        return len(roles), removed
+
+    def search(self, query, location='', sponsorship=None, page=1, page_size=SEARCH_PAGE_SIZE):
+        # Returns (rows for the page, total matches)
+        clauses = [expression for expression in (match_expression(query), match_expression(location, 'locations'))
+                   if expression]
+        if not clauses:
+            return [], 0
+        where = 'jobs_fts MATCH ?'
+        params = [' AND '.join(clauses)]
+        if sponsorship:
+            where += ' AND jobs.sponsorship = ?'
+            params.append(sponsorship)
+        total = self.conn.execute(
+            f'SELECT COUNT(*) FROM jobs_fts JOIN jobs ON jobs.id = jobs_fts.rowid WHERE {where}', params
+        ).fetchone()[0]
+        rows = self.conn.execute(
+            'SELECT jobs.feed, jobs.company, jobs.title, jobs.locations, jobs.sponsorship, jobs.url, jobs.date_posted '
+            f'FROM jobs_fts JOIN jobs ON jobs.id = jobs_fts.rowid WHERE {where} '
+            'ORDER BY bm25(jobs_fts, 2.0, 4.0, 1.0), jobs.date_posted DESC LIMIT ? OFFSET ?',
+            params + [page_size, (page - 1) * page_size],
+        ).fetchall()
+        return rows, total
+
+    def close(self):
+        self.conn.close()
+
+
+def update_job_index(db_path, feed, json_file_path, changed_roles, removed_ids=(), listed_roles=None):
+    # Pipeline stage: runs in the worker pool with its own connection. listed_roles
+    # are the listed records a full parse scan already collected.
+    start = time.perf_counter()
+    index = JobIndex(db_path)
+    try:
+        if listed_roles is not None:
+            added, removed = index.rebuild(feed, listed_roles)
+            mode = 'rebuilt'
+        elif changed_roles is None or index.count(feed) == 0:
+            roles, _ = scan_listings(json_file_path, is_listed)
+            added, removed = index.rebuild(feed, roles)
+            mode = 'rebuilt from a full scan'
+        else:
+            added, removed = index.apply_changes(feed, changed_roles, removed_ids)
+            mode = 'updated'
+    finally:
+        index.close()
+    print(f"Job index {mode} for {feed}: {added} listed, {removed} removed in {time.perf_counter() - start:.2f}s.")
@@ -0,0 +1,44 @@
+import os
+import time
+
+import ijson
+
+# Fastest first; the C backend is only there when yajl was available at install time
+PREFERRED_BACKENDS = ('yajl2_c', 'yajl2_cffi', 'yajl2', 'python')
+
+
+# ===============================================================
+# Backend selection
+# ===============================================================
+def select_backend(name=None):
+    # IJSON_BACKEND forces a backend, otherwise the fastest importable one wins
+    names = (name,) if name else PREFERRED_BACKENDS
+    for candidate in names:
+        try:
+            return ijson.get_backend(candidate)
+        except Exception:
+            continue
+    raise ImportError(f"No usable ijson backend among {names}")
+
+
+# ===============================================================
+# Public entry point
+# ===============================================================
+def scan_listings(json_file_path, keep, backend_name=None):
+    # Returns (the records for which keep(record) is true, records scanned),
+    # streaming the file in a single items() pass
+    backend = select_backend(backend_name or os.getenv('IJSON_BACKEND'))
+    start = time.perf_counter()
+    scanned = 0
+    kept = []
+    with open(json_file_path, 'rb') as file:
+        for record in backend.items(file, 'item'):
+            scanned += 1
+            if keep(record):
+                kept.append(record)
+
+    elapsed = time.perf_counter() - start
+    rate = scanned / elapsed if elapsed > 0 else float(scanned)
+    print(f"Scanned {scanned} records from {json_file_path} with ijson backend "
+          f"'{backend.backend}' in {elapsed:.2f}s ({rate:.0f} records/s), kept {len(kept)}.")
+    return kept, scanned
@@ -0,0 +1,239 @@
+import asyncio
+import json
+import os
+import random
+import time
+
+import discord
+
+import metrics
+
+# Retry delay after a failed delivery: doubles per attempt, with some jitter
+BASE_BACKOFF_SECONDS = 30
+MAX_BACKOFF_SECONDS = 3600
+# A channel's circuit opens after this many failed deliveries in a row. It lets one
+# delivery through after the cooldown, which doubles each time that one fails too.
+BREAKER_THRESHOLD = 3
+BREAKER_COOLDOWN_SECONDS = 300
+BREAKER_MAX_COOLDOWN_SECONDS = 6 * 3600
+# Announcements still undelivered after this long are dropped
+MAX_ENTRY_AGE_SECONDS = 3 * 24 * 3600
+# Only what format_embed reads is kept on disk
+ROLE_FIELDS = ('id', 'company_name', 'title', 'url', 'locations', 'sponsorship', 'date_posted')
+
+DELIVERED = metrics.Counter('farmer_outbound_delivered_total', 'Queued announcements delivered.', ['feed'])
+FAILURES = metrics.Counter('farmer_outbound_failures_total', 'Failed delivery attempts.', ['feed'])
+DROPPED = metrics.Counter('farmer_outbound_dropped_total', 'Announcements given up on.', ['feed', 'reason'])
+
+
+def is_permanent(error):
+    # Discord rejecting the request itself; sending it again cannot succeed
+    return isinstance(error, discord.HTTPException) and error.status == 400
+
+
+def backoff_seconds(attempts):
+    delay = min(BASE_BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+class CircuitBreaker:
+    def __init__(self, failures=0, opened_until=None, cooldown=None):
+        self.failures = failures
+        self.opened_until = opened_until
+        self.cooldown = cooldown or BREAKER_COOLDOWN_SECONDS
+
+    def allows(self, now):
+        # Closed, or open with the cooldown over (one trial delivery)
+        return self.opened_until is None or now >= self.opened_until
+
+    def is_open(self, now):
+        return self.opened_until is not None and now < self.opened_until
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_until = None
+        self.cooldown = BREAKER_COOLDOWN_SECONDS
+
+    def record_failure(self, now):
+        # Returns True when this failure opened the circuit
+        self.failures += 1
+        if self.failures < BREAKER_THRESHOLD:
+            return False
+        if self.opened_until is not None:
+            # The trial after a cooldown failed as well
+            self.cooldown = min(self.cooldown * 2, BREAKER_MAX_COOLDOWN_SECONDS)
+        self.opened_until = now + self.cooldown
+        return True
+
+    def to_dict(self):
+        return {'failures': self.failures, 'opened_until': self.opened_until, 'cooldown': self.cooldown}
+
+
+# ===============================================================
+# Announcements waiting to be posted, saved to disk after every
+# change. Each channel is worked through in order and fails on
+# its own: a broken channel backs off and trips its breaker while
+# the others keep posting.
+# ===============================================================
+class OutboundQueue:
+    def __init__(self, state_file, deliver, on_delivered=None):
+        # deliver(entry) posts one entry and returns what on_delivered(entry, result) gets
+        self.state_file = state_file
+        self.deliver = deliver
+        self.on_delivered = on_delivered
+        self.entries = []
+        self.breakers = {}
+        self.next_id = 1
+        self.wakeup = None
+        self.task = None
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r') as file:
+                state = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"Failed to read outbound queue {self.state_file}: {e}")
+            return
+        self.entries = state.get('entries', [])
+        self.breakers = {channel_id: CircuitBreaker(**breaker)
+                         for channel_id, breaker in state.get('breakers', {}).items()}
+        self.next_id = state.get('next_id', len(self.entries) + 1)
+        if self.entries:
+            print(f"Loaded {len(self.entries)} queued announcements from {self.state_file}.")
+
+    def save(self):
+        state = {
+            'next_id': self.next_id,
+            'entries': self.entries,
+            # Channels in good health need no record
+            'breakers': {channel_id: breaker.to_dict() for channel_id, breaker in self.breakers.items()
+                         if breaker.failures or breaker.opened_until},
+        }
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, 'w') as file:
+            json.dump(state, file)
+        os.replace(tmp_file, self.state_file)
+
+    @property
+    def depth(self):
+        return len(self.entries)
+
+    def open_circuits(self, now=None):
+        now = now or time.time()
+        return sum(1 for breaker in self.breakers.values() if breaker.is_open(now))
+
+    def submit(self, feed, channel_id, batches):
+        # One entry per message, so a retry never reposts roles that already went out
+        now = time.time()
+        for roles in batches:
+            self.entries.append({
+                'id': self.next_id,
+                'feed': feed,
+                'channel_id': str(channel_id),
+                'roles': [{field: role.get(field) for field in ROLE_FIELDS} for role in roles],
+                'created_at': now,
+                'attempts': 0,
+                'next_attempt_at': now,
+            })
+            self.next_id += 1
+        self.save()
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    def start(self):
+        if self.task is None:
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            self.wakeup.clear()
+            try:
+                delay = await self.process_due()
+            except Exception as e:
+                print(f"Outbound queue error: {e}")
+                delay = BASE_BACKOFF_SECONDS
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _breaker(self, channel_id):
+        if channel_id not in self.breakers:
+            self.breakers[channel_id] = CircuitBreaker()
+        return self.breakers[channel_id]
+
+    def _drop(self, entry, reason, detail=''):
+        self.entries.remove(entry)
+        self.dropped += 1
+        DROPPED.inc(entry['feed'], reason)
+        print(f"Dropped queued {entry['feed']} announcement for channel {entry['channel_id']} "
+              f"({len(entry['roles'])} roles): {reason} {detail}".rstrip())
+
+    async def process_due(self):
+        # Delivers every entry that is due; returns seconds until the next one is (None when empty)
+        blocked = set()
+        for entry in list(self.entries):
+            channel_id = entry['channel_id']
+            if channel_id in blocked:
+                continue
+            now = time.time()
+            if now - entry['created_at'] > MAX_ENTRY_AGE_SECONDS:
+                self._drop(entry, 'expired')
+                self.save()
+                continue
+            breaker = self._breaker(channel_id)
+            if entry['next_attempt_at'] > now or not breaker.allows(now):
+                # Later entries for the channel wait their turn
+                blocked.add(channel_id)
+                continue
+            try:
+                result = await self.deliver(entry)
+            except Exception as e:
+                if is_permanent(e):
+                    self._drop(entry, 'rejected', str(e))
+                else:
+                    entry['attempts'] += 1
+                    entry['next_attempt_at'] = time.time() + backoff_seconds(entry['attempts'])
+                    self.failed += 1
+                    FAILURES.inc(entry['feed'])
+                    blocked.add(channel_id)
+                    opened = breaker.record_failure(time.time())
+                    print(f"Delivery to channel {channel_id} failed (attempt {entry['attempts']}): {e}")
+                    if opened:
+                        print(f"Circuit for channel {channel_id} open for {breaker.cooldown:.0f}s "
+                              f"after {breaker.failures} failures in a row.")
+                self.save()
+                continue
+            self.entries.remove(entry)
+            breaker.record_success()
+            self.delivered += 1
+            DELIVERED.inc(entry['feed'])
+            self.save()
+            if self.on_delivered:
+                try:
+                    self.on_delivered(entry, result)
+                except Exception as e:
+                    print(f"Failed to record delivery of {entry['feed']} roles: {e}")
+        return self.next_due_in()
+
+    def next_due_in(self):
+        if not self.entries:
+            return None
+        # Only the oldest entry of each channel can be sent next
+        heads = {}
+        for entry in self.entries:
+            heads.setdefault(entry['channel_id'], entry)
+        due = [max(entry['next_attempt_at'], self._breaker(channel_id).opened_until or 0)
+               for channel_id, entry in heads.items()]
+        return max(0.0, min(due) - time.time())
+
+    def stats(self):
+        return (f"depth={self.depth} delivered={self.delivered} failed={self.failed} "
+                f"dropped={self.dropped} open_circuits={self.open_circuits()}")
@@ -0,0 +1,87 @@
+import json
+import sqlite3
+import time
+
+
+# ===============================================================
+# Where each announced role was posted: channel, message and the
+# position of its embed, plus the embed itself so a message can be
+# edited without fetching it first
+# ===============================================================
+class PostedRolesStore:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS posted_roles ('
+            ' feed TEXT NOT NULL,'
+            ' role_id TEXT NOT NULL,'
+            ' channel_id INTEGER NOT NULL,'
+            ' message_id INTEGER NOT NULL,'
+            ' embed_index INTEGER NOT NULL,'
+            ' embed TEXT NOT NULL,'
+            ' posted_at INTEGER NOT NULL,'
+            ' closed INTEGER NOT NULL DEFAULT 0,'
+            ' PRIMARY KEY (feed, role_id, channel_id)'
+            ') WITHOUT ROWID'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_posted_roles_message ON posted_roles (message_id)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_posted_roles_open ON posted_roles (feed, closed)')
+        self.conn.commit()
+
+    def add(self, feed, channel_id, sent, posted_at=None):
+        # sent is what send_role_batches returns: [(message, roles in that message)]
+        posted_at = int(posted_at if posted_at is not None else time.time())
+        rows = []
+        for message, batch in sent:
+            for index, role in enumerate(batch):
+                embed = message.embeds[index].to_dict() if index < len(message.embeds) else {}
+                rows.append((feed, role['id'], int(channel_id), message.id, index, json.dumps(embed), posted_at))
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO posted_roles '
+                '(feed, role_id, channel_id, message_id, embed_index, embed, posted_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                rows,
+            )
+        return len(rows)
+
+    def open_role_ids(self, feed):
+        rows = self.conn.execute('SELECT DISTINCT role_id FROM posted_roles WHERE feed = ? AND closed = 0', (feed,))
+        return [role_id for role_id, in rows]
+
+    def messages_for(self, feed, role_ids):
+        # (channel id, message id) -> [(embed index, role id, embed dict, closed)] for every
+        # message holding one of the roles, with all of that message's embeds
+        message_ids = {}
+        for role_id in role_ids:
+            for channel_id, message_id in self.conn.execute(
+                'SELECT channel_id, message_id FROM posted_roles WHERE feed = ? AND role_id = ?', (feed, role_id)
+            ):
+                message_ids[message_id] = channel_id
+        messages = {}
+        for message_id, channel_id in message_ids.items():
+            rows = self.conn.execute(
+                'SELECT embed_index, role_id, embed, closed FROM posted_roles WHERE message_id = ? ORDER BY embed_index',
+                (message_id,),
+            ).fetchall()
+            messages[(channel_id, message_id)] = [(index, role_id, json.loads(embed), bool(closed))
+                                                  for index, role_id, embed, closed in rows]
+        return messages
+
+    def mark_closed(self, message_id, role_ids):
+        with self.conn:
+            self.conn.executemany(
+                'UPDATE posted_roles SET closed = 1 WHERE message_id = ? AND role_id = ?',
+                ((message_id, role_id) for role_id in role_ids),
+            )
+
+    def evict_older_than(self, max_age_seconds):
+        cutoff = int(time.time() - max_age_seconds)
+        with self.conn:
+            cursor = self.conn.execute('DELETE FROM posted_roles WHERE posted_at < ?', (cutoff,))
+        return cursor.rowcount
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,66 @@
+import json
+import os
+import sqlite3
+import time
+
+
+# ===============================================================
+# Persistent store of role ids that were already announced
+# ===============================================================
+class SeenRolesStore:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        # WAL keeps readers and the nightly insert from blocking each other
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS seen_roles ('
+            ' feed TEXT NOT NULL,'
+            ' role_id TEXT NOT NULL,'
+            ' seen_at INTEGER NOT NULL,'
+            ' PRIMARY KEY (feed, role_id)'
+            ') WITHOUT ROWID'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_seen_roles_seen_at ON seen_roles (seen_at)')
+        self.conn.commit()
+
+    def contains(self, feed, role_id):
+        row = self.conn.execute(
+            'SELECT 1 FROM seen_roles WHERE feed = ? AND role_id = ?', (feed, role_id)
+        ).fetchone()
+        return row is not None
+
+    def add_many(self, feed, role_ids, seen_at=None):
+        seen_at = int(seen_at if seen_at is not None else time.time())
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO seen_roles (feed, role_id, seen_at) VALUES (?, ?, ?)',
+                ((feed, role_id, seen_at) for role_id in role_ids),
+            )
+
+    def evict_older_than(self, max_age_seconds):
+        cutoff = int(time.time() - max_age_seconds)
+        with self.conn:
+            cursor = self.conn.execute('DELETE FROM seen_roles WHERE seen_at < ?', (cutoff,))
+        return cursor.rowcount
+
+    def migrate_json(self, feed, json_file):
+        # One-shot import of the old roles_data.json files. Old runs stored each id
+        # as a list of characters, so those are joined back into the real id.
+        if not os.path.exists(json_file):
+            return 0
+        try:
+            with open(json_file, 'r') as file:
+                items = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"Failed to migrate {json_file}: {e}")
+            return 0
+        role_ids = [''.join(item) if isinstance(item, list) else str(item) for item in items]
+        self.add_many(feed, role_ids)
+        os.replace(json_file, f"{json_file}.migrated")
+        print(f"Migrated {len(role_ids)} role ids from {json_file} into {self.db_path}.")
+        return len(role_ids)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,174 @@
+import asyncio
+import time
+
+import discord
+
+import metrics
+
+# Discord caps a message at 10 embeds and 6000 characters across all of them
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+MAX_RATE_LIMIT_RETRIES = 3
+
+SEND_SECONDS = metrics.Histogram('farmer_send_seconds', 'Latency of one channel.send of packed roles.', ['feed'])
+RATE_LIMIT_RETRIES = metrics.Counter('farmer_rate_limit_retries_total', 'Sends retried after a 429.', ['feed'])
+RATE_LIMIT_WAIT = metrics.Counter('farmer_rate_limit_wait_seconds_total', 'Seconds spent waiting out 429s.', ['feed'])
+
+
+# ===============================================================
+# Pack roles into as few messages as Discord allows
+# ===============================================================
+def pack_roles(roles, format_embed):
+    batches = []
+    batch, embeds, chars = [], [], 0
+    for role in roles:
+        embed = format_embed(role)
+        size = len(embed)
+        if embeds and (len(embeds) == MAX_EMBEDS_PER_MESSAGE or chars + size > MAX_EMBED_CHARS_PER_MESSAGE):
+            batches.append((batch, embeds))
+            batch, embeds, chars = [], [], 0
+        batch.append(role)
+        embeds.append(embed)
+        chars += size
+    if embeds:
+        batches.append((batch, embeds))
+    return batches
+
+
+def retry_after_seconds(error):
+    # Prefer the bucket reset Discord reports; fall back to Retry-After
+    headers = getattr(error.response, 'headers', None) or {}
+    for header in ('X-RateLimit-Reset-After', 'Retry-After'):
+        value = headers.get(header)
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                pass
+    return 1.0
+
+
+async def retry_rate_limited(call, feed):
+    # Runs call() again after the reset time Discord reports when a 429 slips through
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        try:
+            return await call()
+        except discord.HTTPException as e:
+            if e.status != 429 or attempt == MAX_RATE_LIMIT_RETRIES:
+                raise
+            wait = retry_after_seconds(e)
+            RATE_LIMIT_RETRIES.inc(feed)
+            RATE_LIMIT_WAIT.inc(feed, amount=wait)
+            print(f"Rate limited ({feed}), retrying in {wait:.2f}s...")
+            await asyncio.sleep(wait)
+
+
+# ===============================================================
+# Send the packed messages
+# ===============================================================
+async def send_role_batches(channel, roles, format_embed, feed):
+    # discord.py already reads the X-RateLimit-* headers of every response and
+    # holds the next request in the same bucket until it resets, so there are no
+    # fixed sleeps here. A 429 that still slips through is retried after the reset
+    # time Discord reports.
+    start = time.perf_counter()
+    sent = []
+    for batch, embeds in pack_roles(roles, format_embed):
+        async def send():
+            with SEND_SECONDS.time(feed):
+                return await channel.send(embeds=embeds)
+
+        message = await retry_rate_limited(send, feed)
+        sent.append((message, batch))
+
+    elapsed = time.perf_counter() - start
+    role_count = sum(len(batch) for _, batch in sent)
+    rate = role_count / elapsed if elapsed > 0 else float(role_count)
+    print(f"Sent {role_count} {feed} roles in {len(sent)} messages in {elapsed:.2f}s ({rate:.1f} roles/s).")
+    return sent
+
+
+EDITS_DONE = metrics.Counter('farmer_message_edits_total', 'Posted role messages edited.', ['feed', 'result'])
+
+
+async def edit_role_messages(edits, feed, interval=0.5):
+    # edits: [(channel, message id, embeds)]. One edit at a time with a pause in between,
+    # so a night with many closed roles does not crowd out the new announcements.
+    # Returns the message ids that were edited or no longer exist.
+    done = []
+    for position, (channel, message_id, embeds) in enumerate(edits):
+        if position and interval:
+            await asyncio.sleep(interval)
+        message = channel.get_partial_message(message_id)
+        try:
+            await retry_rate_limited(lambda: message.edit(embeds=embeds), feed)
+            EDITS_DONE.inc(feed, 'edited')
+            done.append(message_id)
+        except discord.NotFound:
+            EDITS_DONE.inc(feed, 'missing')
+            done.append(message_id)
+        except discord.HTTPException as e:
+            EDITS_DONE.inc(feed, 'failed')
+            print(f"Failed to edit message {message_id} in channel {channel.id}: {e}")
+    return done
+
+
+DMS_SENT = metrics.Counter('farmer_dms_sent_total', 'Subscription DMs delivered.')
+DMS_FAILED = metrics.Counter('farmer_dms_failed_total', 'Subscription DMs that could not be delivered.', ['reason'])
+
+
+# ===============================================================
+# Paced fan-out of subscription DMs
+# ===============================================================
+class DmFanout:
+    def __init__(self, get_user, concurrency=2, interval=1.0):
+        # get_user(user_id) is an async lookup; each worker waits `interval`
+        # seconds between DMs, which keeps a few thousand DMs a night well
+        # under Discord's limits for new DM channels.
+        self.get_user = get_user
+        self.concurrency = concurrency
+        self.interval = interval
+        self.queue = asyncio.Queue()
+        self.workers = []
+        self.sent = 0
+        self.failed = 0
+        self.closed = 0
+
+    @property
+    def depth(self):
+        return self.queue.qsize()
+
+    def start(self):
+        if not self.workers:
+            self.workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    def submit(self, user_id, contents):
+        self.start()
+        self.queue.put_nowait((user_id, contents))
+
+    async def _send(self, user, content):
+        return await retry_rate_limited(lambda: user.send(content), 'dm')
+
+    async def _worker(self):
+        while True:
+            user_id, contents = await self.queue.get()
+            try:
+                user = await self.get_user(user_id)
+                for content in contents:
+                    await self._send(user, content)
+                    await asyncio.sleep(self.interval)
+                self.sent += 1
+                DMS_SENT.inc()
+            except discord.Forbidden:
+                # The member closed their DMs or left every shared server
+                self.closed += 1
+                DMS_FAILED.inc('forbidden')
+            except Exception as e:
+                self.failed += 1
+                DMS_FAILED.inc('error')
+                print(f"Failed to DM subscriber {user_id}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def stats(self):
+        return f"depth={self.depth} sent={self.sent} closed={self.closed} failed={self.failed}"
@@ -0,0 +1,203 @@
+import json
+import re
+import sqlite3
+import time
+from collections import Counter
+
+# Fields a subscription can filter on, and the role field each one reads
+SUBSCRIPTION_FIELDS = {
+    'companies': 'company_name',
+    'keywords': 'title',
+    'locations': 'locations',
+}
+# "!subscribe" spellings of each field
+FIELD_ALIASES = {
+    'company': 'companies', 'companies': 'companies',
+    'keyword': 'keywords', 'keywords': 'keywords', 'title': 'keywords',
+    'location': 'locations', 'locations': 'locations',
+    'sponsorship': 'sponsorship',
+}
+SPONSORSHIP_CHOICES = {
+    'yes': 'Offers Sponsorship',
+    'no': 'Does Not Offer Sponsorship',
+    'citizen': 'U.S. Citizenship is Required',
+}
+MAX_SUBSCRIPTIONS_PER_USER = 10
+# Discord rejects DMs over 2000 characters
+MAX_DM_CHARS = 2000
+
+TOKEN = re.compile(r'[a-z0-9+#]+')
+ARGUMENT = re.compile(r'(\w+)\s*=\s*(.*?)(?=\s+\w+\s*=|$)')
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+def phrase_text(tokens):
+    # Padded so " new york " only matches whole words
+    return ' ' + ' '.join(tokens) + ' '
+
+
+def parse_subscription(text):
+    # "company=Google, Meta keyword=backend location=remote sponsorship=yes"
+    filters = {}
+    for key, value in ARGUMENT.findall(text.strip()):
+        field = FIELD_ALIASES.get(key.lower())
+        if field is None:
+            raise ValueError(f"Unknown filter '{key}'. Use company, keyword, location or sponsorship.")
+        if field == 'sponsorship':
+            choice = value.strip().lower()
+            if choice not in SPONSORSHIP_CHOICES:
+                raise ValueError(f"Sponsorship must be one of: {', '.join(SPONSORSHIP_CHOICES)}.")
+            filters[field] = SPONSORSHIP_CHOICES[choice]
+        else:
+            phrases = [' '.join(tokenize(part)) for part in value.split(',')]
+            filters[field] = sorted({phrase for phrase in phrases if phrase})
+    if not any(filters.values()):
+        raise ValueError("Add at least one filter, e.g. `!subscribe keyword=backend location=remote`.")
+    return filters
+
+
+class Subscription:
+    def __init__(self, sub_id, user_id, filters, created_at=None):
+        self.id = sub_id
+        self.user_id = user_id
+        self.filters = filters
+        self.created_at = created_at or time.time()
+
+    @property
+    def required(self):
+        # How many fields a role has to match
+        return sum(1 for value in self.filters.values() if value)
+
+    def describe(self):
+        parts = [f"{field}={', '.join(value) if isinstance(value, list) else value}"
+                 for field, value in self.filters.items() if value]
+        return f"#{self.id}: " + ' '.join(parts)
+
+
+# ===============================================================
+# Subscriptions on disk plus an inverted index over their filters.
+# Each phrase is indexed under its first word, so matching a role
+# only visits the subscriptions that share a word with it.
+# ===============================================================
+class SubscriptionIndex:
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS subscriptions ('
+            ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+            ' user_id INTEGER NOT NULL,'
+            ' filters TEXT NOT NULL,'
+            ' created_at REAL NOT NULL'
+            ')'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_subscriptions_user ON subscriptions (user_id)')
+        self.conn.commit()
+        self.subscriptions = {}
+        self.by_user = {}
+        # field -> first word -> [(subscription id, phrase)]
+        self.postings = {field: {} for field in SUBSCRIPTION_FIELDS}
+        # sponsorship value -> {subscription id}
+        self.sponsorship = {}
+        rows = self.conn.execute('SELECT id, user_id, filters, created_at FROM subscriptions').fetchall()
+        for sub_id, user_id, filters, created_at in rows:
+            self._index(Subscription(sub_id, user_id, json.loads(filters), created_at))
+
+    def __len__(self):
+        return len(self.subscriptions)
+
+    def _index(self, subscription):
+        self.subscriptions[subscription.id] = subscription
+        self.by_user.setdefault(subscription.user_id, set()).add(subscription.id)
+        for field in SUBSCRIPTION_FIELDS:
+            for phrase in subscription.filters.get(field) or []:
+                self.postings[field].setdefault(phrase.split(' ', 1)[0], []).append((subscription.id, phrase))
+        if subscription.filters.get('sponsorship'):
+            self.sponsorship.setdefault(subscription.filters['sponsorship'], set()).add(subscription.id)
+
+    def _unindex(self, subscription):
+        self.subscriptions.pop(subscription.id, None)
+        self.by_user.get(subscription.user_id, set()).discard(subscription.id)
+        for field in SUBSCRIPTION_FIELDS:
+            for phrase in subscription.filters.get(field) or []:
+                word = phrase.split(' ', 1)[0]
+                postings = [entry for entry in self.postings[field].get(word, []) if entry[0] != subscription.id]
+                if postings:
+                    self.postings[field][word] = postings
+                else:
+                    self.postings[field].pop(word, None)
+        if subscription.filters.get('sponsorship'):
+            self.sponsorship.get(subscription.filters['sponsorship'], set()).discard(subscription.id)
+
+    def for_user(self, user_id):
+        return [self.subscriptions[sub_id] for sub_id in sorted(self.by_user.get(user_id, ()))]
+
+    def add(self, user_id, filters):
+        if len(self.for_user(user_id)) >= MAX_SUBSCRIPTIONS_PER_USER:
+            raise ValueError(f"You can have at most {MAX_SUBSCRIPTIONS_PER_USER} subscriptions.")
+        created_at = time.time()
+        with self.conn:
+            sub_id = self.conn.execute(
+                'INSERT INTO subscriptions (user_id, filters, created_at) VALUES (?, ?, ?)',
+                (user_id, json.dumps(filters), created_at),
+            ).lastrowid
+        subscription = Subscription(sub_id, user_id, filters, created_at)
+        self._index(subscription)
+        return subscription
+
+    def remove(self, user_id, sub_id=None):
+        # Removes one of the user's subscriptions, or all of them when sub_id is None
+        removed = [subscription for subscription in self.for_user(user_id) if sub_id in (None, subscription.id)]
+        with self.conn:
+            self.conn.executemany('DELETE FROM subscriptions WHERE id = ?', [(s.id,) for s in removed])
+        for subscription in removed:
+            self._unindex(subscription)
+        return len(removed)
+
+    def match(self, role):
+        # Ids of the subscriptions whose every filter matches the role
+        hits = Counter()
+        role_texts = {
+            'companies': role.get('company_name') or '',
+            'keywords': role.get('title') or '',
+            'locations': ' | '.join(role.get('locations') or []),
+        }
+        for field, text in role_texts.items():
+            tokens = tokenize(text)
+            padded = phrase_text(tokens)
+            matched = set()
+            for word in set(tokens):
+                for sub_id, phrase in self.postings[field].get(word, ()):
+                    if sub_id not in matched and (' ' not in phrase or f' {phrase} ' in padded):
+                        matched.add(sub_id)
+            hits.update(matched)
+        hits.update(self.sponsorship.get(role.get('sponsorship'), ()))
+        return [sub_id for sub_id, count in hits.items() if count == self.subscriptions[sub_id].required]
+
+    def match_batch(self, roles):
+        # One pass over the batch: user id -> roles, each role at most once per user
+        matches = {}
+        for role in roles:
+            for user_id in {self.subscriptions[sub_id].user_id for sub_id in self.match(role)}:
+                matches.setdefault(user_id, []).append(role)
+        return matches
+
+    def close(self):
+        self.conn.close()
+
+
+def pack_dm_messages(header, texts, limit=MAX_DM_CHARS):
+    # Joins formatted roles into as few DMs as fit under Discord's limit
+    messages, current = [], header
+    for text in texts:
+        text = text[:limit]
+        if len(current) + len(text) > limit:
+            messages.append(current)
+            current = ''
+        current += text
+    if current:
+        messages.append(current)
+    return messages